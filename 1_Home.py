@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, timedelta
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from data_cube import load_kpi_cube, slice_cube, cube_totals, frame_totals, distinct_client_count
+from data_index import filter_rows, load_date_index, last_days_positions
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(
@@ -14,7 +16,9 @@ st.set_page_config(
 )
 
 # 3. LOAD THE DATA
+timer = start_page("Home")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 # 4. SAFETY CHECK
 if not df.empty:
@@ -44,35 +48,34 @@ if not df.empty:
 
     st.markdown("---")
     
-    # 7. FILTER DATAFRAME
-    df_filtered = df.copy()
-    
-    # Apply the Gender filter
-    if selected_gender:
-        df_filtered = df_filtered[df_filtered['Gender'] == selected_gender]
+    # 7. FILTER DATA
+    # 'All Time' only filters on Gender, which the pre-added-up cube covers,
+    # so we don't need to touch the client rows at all.
+    if selected_time == "All Time":
+        cube, distinct = load_kpi_cube(df)
+        totals = cube_totals(slice_cube(cube, {'Gender': selected_gender}))
+        kpi_total_clients = distinct_client_count(distinct, {'Gender': selected_gender})
+    else:
+        # --- THIS IS THE FIX ---
+        # The window is relative to the latest date in the dataset, our "today".
+        # The sorted date index finds it with a binary search instead of
+        # comparing every row's date.
+        window_days = {"Last 30 D": 30, "Last 90 D": 90, "Last 6 M": 180, "Last 12 M": 365}
+        window_positions = last_days_positions(load_date_index(df), window_days[selected_time])
 
-    # --- THIS IS THE FIX ---
-    # We find the latest date in the dataset to use as our "today".
-    data_max_date = df['Joined Bank'].max()
-    
-    # Now we filter relative to the data's latest date.
-    if selected_time == "Last 30 D":
-        df_filtered = df_filtered[df_filtered['Joined Bank'] >= (data_max_date - timedelta(days=30))]
-    elif selected_time == "Last 90 D":
-        df_filtered = df_filtered[df_filtered['Joined Bank'] >= (data_max_date - timedelta(days=90))]
-    elif selected_time == "Last 6 M":
-        df_filtered = df_filtered[df_filtered['Joined Bank'] >= (data_max_date - timedelta(days=180))]
-    elif selected_time == "Last 12 M":
-        df_filtered = df_filtered[df_filtered['Joined Bank'] >= (data_max_date - timedelta(days=365))]
-    # 'All Time' needs no filter
+        # Apply the Gender filter (through the bitmap index) within that window
+        df_filtered = filter_rows(df, {'Gender': selected_gender}, within=window_positions)
+
+        totals = frame_totals(df_filtered)
+        kpi_total_clients = df_filtered['Client ID'].nunique()
+    lap(timer, "filter", rows=int(totals['Client Count']))
     
     # 8. CALCULATE KPIs
-    kpi_total_clients = df_filtered['Client ID'].nunique()
-    kpi_total_loan = df_filtered['Total Loan'].sum()
-    kpi_total_deposit = df_filtered['Total Deposit'].sum()
-    kpi_total_fees = (df_filtered['Total Loan'] * df_filtered['Processing Fees']).sum()
-    kpi_total_cc_amount = df_filtered['Amount of Credit Cards'].sum()
-    kpi_saving_account = df_filtered['Saving Accounts'].sum()
+    kpi_total_loan = totals['Total Loan']
+    kpi_total_deposit = totals['Total Deposit']
+    kpi_total_fees = totals['Total Fees']
+    kpi_total_cc_amount = totals['Amount of Credit Cards']
+    kpi_saving_account = totals['Saving Accounts']
 
     # 9. DISPLAY KPIs
     kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
@@ -88,6 +91,7 @@ if not df.empty:
     with kpi_col3:
         st.metric(label="Total CC Amount", value=f"${kpi_total_cc_amount:,.2f}")
         st.metric(label="Saving Account Amount", value=f"${kpi_saving_account:,.2f}")
+    lap(timer, "kpis")
             
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
@@ -0,0 +1,394 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from charts import box_summary, density_grid, histogram_counts
+from data_basket import build_basket_counts, build_rule_table, cross_sell_positions, filter_rules
+from data_cube import build_distinct_clients
+from data_index import (
+    bitmap_positions,
+    build_client_index,
+    build_date_index,
+    build_filter_index,
+    last_days_positions,
+    search_index,
+    select,
+)
+from data_processing import (
+    PRODUCT_COLS,
+    SOURCE_FILES,
+    aggregate_frame,
+    apply_dtype_plan,
+    build_clean_data,
+    load_or_build,
+    memory_report,
+    merge_and_engineer,
+    parse_dates,
+)
+from data_stats import (
+    MOMENT_COLUMNS,
+    build_gram,
+    build_moments,
+    correlation_from_moments,
+    anova_from_moments,
+    fit_from_gram,
+    group_moments,
+    pair_sums,
+    regression_from_sums,
+    welch_from_moments,
+)
+from generate_data import write_client_book
+from tables import sort_order
+
+# 1. DEFINE THE SCALES AND WHERE THINGS GO
+# The client-book sizes to benchmark by default. 10M rows also works
+# (the generator and the streaming loader never hold it all at once), but
+# the in-memory steps need several GB of RAM, so ask for it with --rows.
+DEFAULT_SCALES = [10000, 100000, 1000000]
+BENCH_DATA_DIR = "bench_data"
+RESULTS_DIR = "benchmark_results"
+
+
+# 2. THE PAGE BENCHMARKS
+# Each entry is name -> function(df). The function runs the computational
+# core of a page (the part that touches client rows) on the clean frame,
+# without drawing anything. Steps that only need to run once per scale,
+# like loading, are timed separately in run_scale.
+def bench_bitmap_filter(df):
+    index = build_filter_index(df)
+    return bitmap_positions(index, select(index, {
+        'Gender': 'Male', 'Banking Relationship': 'Retail', 'Investment Advisor': 'Victor Dean'
+    }))
+
+
+def bench_mask_filter(df):
+    mask = (df['Gender'] == 'Male') & (df['Banking Relationship'] == 'Retail') & \
+           (df['Investment Advisor'] == 'Victor Dean')
+    return df[mask]
+
+
+def bench_date_window(df):
+    return last_days_positions(build_date_index(df), 365)
+
+
+def bench_kpi_cube(df):
+    return aggregate_frame(df), build_distinct_clients(df)
+
+
+def bench_advisor_groupby(df):
+    df_clients = df.groupby('Investment Advisor', observed=True)['Client ID'].nunique()
+    df_financials = df.groupby('Investment Advisor', observed=True)[['Total Deposit', 'Total Loan']].sum()
+    df_loyalty = df.groupby(['Investment Advisor', 'Loyalty Classification'], observed=True)['Client ID'].count()
+    return df_clients, df_financials, df_loyalty
+
+
+def bench_fee_groupby(df):
+    return df.groupby('Fee Structure', observed=True)['Total Fees'].sum()
+
+
+def bench_corr(df):
+    return df[MOMENT_COLUMNS].corr()
+
+
+def bench_moments_corr(df):
+    return correlation_from_moments(build_moments(df), MOMENT_COLUMNS)
+
+
+def bench_linregress(df):
+    df_clean = df[['Estimated Income', 'Total Deposit']].dropna()
+    return stats.linregress(df_clean['Estimated Income'], df_clean['Total Deposit'])
+
+
+def bench_regression_sums(df):
+    return regression_from_sums(pair_sums(df, 'Estimated Income', 'Total Deposit'))
+
+
+def bench_multiple_regression(df):
+    return fit_from_gram(
+        build_gram(df), 'Total Deposit', ['Estimated Income', 'Age', 'Superannuation Savings', 'Bank Loans'],
+        ['Gender', 'Investment Advisor', 'Loyalty Classification']
+    )
+
+
+def _group_arrays(df, cat_var, num_var):
+    return [df.loc[df[cat_var] == group, num_var].dropna() for group in df[cat_var].dropna().unique()]
+
+
+def bench_ttest(df):
+    data1, data2 = _group_arrays(df, 'Gender', 'Total Deposit')
+    return stats.ttest_ind(data1, data2, equal_var=False)
+
+
+def bench_anova(df):
+    return stats.f_oneway(*_group_arrays(df, 'Banking Relationship', 'Total Deposit'))
+
+
+def bench_moment_tests(df):
+    return (welch_from_moments(group_moments(df, 'Gender', 'Total Deposit')),
+            anova_from_moments(group_moments(df, 'Banking Relationship', 'Total Deposit')))
+
+
+def bench_box_summary(df):
+    return box_summary(df, 'Loyalty Classification', 'Engagment Days')
+
+
+def bench_histogram(df):
+    return histogram_counts(df['Superannuation Savings'], 50)
+
+
+def bench_density_grid(df):
+    return density_grid(df, 'Estimated Income', 'Superannuation Savings', color='Loyalty Classification')
+
+
+def bench_apriori(df):
+    # Imported here so the rest of the suite still runs without mlxtend.
+    from mlxtend.frequent_patterns import apriori, association_rules
+    df_basket = df[[f'Has {col}' for col in PRODUCT_COLS]]
+    df_basket.columns = PRODUCT_COLS
+    frequent_itemsets = apriori(df_basket, min_support=0.02, use_colnames=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return association_rules(frequent_itemsets, metric="lift", min_threshold=1.0)
+
+
+def bench_basket_rules(df):
+    return filter_rules(build_rule_table(build_basket_counts(df)['clients'].to_numpy()), min_support=0.02)
+
+
+def bench_cross_sell_loop(df):
+    mask = np.ones(len(df), dtype=bool)
+    for product in ['Saving Accounts', 'Checking Accounts']:
+        mask &= df[f'Has {product}'].to_numpy()
+    for product in ['Credit Card Balance', 'Business Lending']:
+        mask &= ~df[f'Has {product}'].to_numpy()
+    return np.flatnonzero(mask)
+
+
+def bench_cross_sell_code(df):
+    return cross_sell_positions(df, ['Saving Accounts', 'Checking Accounts'], ['Credit Card Balance', 'Business Lending'])
+
+
+def bench_table_indexes(df):
+    return search_index(df, 'Name'), search_index(df, 'Client ID'), sort_order(df, 'Estimated Income')
+
+
+def bench_client_index(df):
+    return build_client_index(df)
+
+
+BENCHMARKS = {
+    'filter: bitmap index': bench_bitmap_filter,
+    'filter: boolean mask': bench_mask_filter,
+    'filter: date window': bench_date_window,
+    'groupby: KPI cube': bench_kpi_cube,
+    'groupby: advisor': bench_advisor_groupby,
+    'groupby: fee structure': bench_fee_groupby,
+    'stats: corr': bench_corr,
+    'stats: moment matrix corr': bench_moments_corr,
+    'stats: linregress': bench_linregress,
+    'stats: regression sums': bench_regression_sums,
+    'stats: multiple regression': bench_multiple_regression,
+    'stats: t-test': bench_ttest,
+    'stats: ANOVA': bench_anova,
+    'stats: grouped moments tests': bench_moment_tests,
+    'chart: box summary': bench_box_summary,
+    'chart: histogram': bench_histogram,
+    'chart: density grid': bench_density_grid,
+    'mining: apriori': bench_apriori,
+    'mining: basket counts': bench_basket_rules,
+    'filter: cross-sell flags': bench_cross_sell_loop,
+    'filter: cross-sell code': bench_cross_sell_code,
+    'table: search + sort indexes': bench_table_indexes,
+    'lookup: client ID index': bench_client_index,
+}
+
+
+# 3. TIMING HELPERS
+def time_call(func, *args, repeat=1):
+    """
+    Runs func(*args) `repeat` times and returns the timings in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _record(results, rows, step, timings=None, error=None):
+    """
+    Adds one result row; min and median are what runs are compared on.
+    """
+    row = {'rows': rows, 'step': step}
+    if error is None:
+        row.update(min_s=min(timings), median_s=float(np.median(timings)), runs=len(timings))
+    else:
+        row['error'] = error
+    results.append(row)
+    print(f"{rows:>11,}  {step:<26} " + (f"{min(timings):10.4f}s" if error is None else error), flush=True)
+
+
+def parse_dates_inferred(values):
+    """
+    The original way of parsing 'Joined Bank': pandas guesses the format
+    (slow, and it can guess month-first). Its warning about guessing is
+    the point here, so it is silenced.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        return pd.to_datetime(values, errors='coerce')
+
+
+def memory_footprint(data_dir):
+    """
+    The bytes per row of the merged client frame before and after
+    apply_dtype_plan, in total and per column (see memory_report).
+    """
+    df_main = pd.read_csv(os.path.join(data_dir, SOURCE_FILES["main"]))
+    dimensions = [
+        pd.read_csv(os.path.join(data_dir, SOURCE_FILES[name])) for name in ('gender', 'relationship', 'advisor')
+    ]
+    df_before = merge_and_engineer(df_main, *dimensions)
+    report = memory_report(df_before, apply_dtype_plan(df_before.copy()))
+    total = report.loc['Total']
+    return {
+        'bytes_per_row_before': float(total['Bytes/Row Before']),
+        'bytes_per_row_after': float(total['Bytes/Row After']),
+        'columns': report.drop(index='Total').rename_axis('column').reset_index().to_dict('records'),
+    }
+
+
+def run_scale(rows, repeat=3, seed=0):
+    """
+    Benchmarks one client-book size. The synthetic data is generated
+    the first time and reused by later runs with the same size and seed.
+    Returns (results, memory): the timings and memory_footprint's result.
+    """
+    results = []
+    memory = None
+    data_dir = os.path.join(BENCH_DATA_DIR, f"{rows}-seed{seed}")
+    snapshot_dir = os.path.join(data_dir, ".snapshots")
+    if not os.path.exists(os.path.join(data_dir, "Banking.csv")):
+        write_client_book(data_dir, rows, seed=seed)
+
+    # 4. LOADING: full clean, cold snapshot build, warm snapshot read
+    try:
+        _record(results, rows, 'load: clean CSV', time_call(build_clean_data, data_dir))
+        for name in os.listdir(snapshot_dir) if os.path.isdir(snapshot_dir) else []:
+            os.remove(os.path.join(snapshot_dir, name))
+        _record(results, rows, 'load: snapshot build', time_call(load_or_build, data_dir, snapshot_dir))
+        _record(results, rows, 'load: snapshot hit', time_call(load_or_build, data_dir, snapshot_dir, repeat=repeat))
+        df = load_or_build(data_dir, snapshot_dir)
+    except MemoryError:
+        _record(results, rows, 'load', error='out of memory')
+        return results, memory
+
+    # 4b. DATE PARSING: format guessed by pandas vs the declared format
+    raw_dates = pd.read_csv(os.path.join(data_dir, SOURCE_FILES["main"]), usecols=['Joined Bank'])['Joined Bank']
+    _record(results, rows, 'dates: inferred format', time_call(parse_dates_inferred, raw_dates, repeat=repeat))
+    _record(results, rows, 'dates: parse_dates', time_call(parse_dates, raw_dates, repeat=repeat))
+    del raw_dates
+
+    # 4c. MEMORY: bytes per row before and after the dtype plan
+    try:
+        memory = memory_footprint(data_dir)
+        print(f"{rows:>11,}  {'memory: bytes/row':<26} "
+              f"{memory['bytes_per_row_before']:,.0f} -> {memory['bytes_per_row_after']:,.0f}", flush=True)
+    except MemoryError:
+        print(f"{rows:>11,}  {'memory: bytes/row':<26} out of memory", flush=True)
+
+    # 5. THE PAGE BENCHMARKS
+    for step, func in BENCHMARKS.items():
+        try:
+            _record(results, rows, step, time_call(func, df, repeat=repeat))
+        except MemoryError:
+            _record(results, rows, step, error='out of memory')
+        except ImportError as e:
+            _record(results, rows, step, error=f'skipped ({e.name} not installed)')
+    return results, memory
+
+
+def _git_commit():
+    """
+    The commit the benchmark ran on, so reports can be matched to code.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scales=DEFAULT_SCALES, repeat=3, seed=0):
+    """
+    Runs every scale and returns the report: the results plus enough
+    about the machine and code to tell two reports apart.
+    """
+    report = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': repeat,
+        'seed': seed,
+        'results': [],
+        'memory': [],
+    }
+    for rows in scales:
+        results, memory = run_scale(rows, repeat=repeat, seed=seed)
+        report['results'].extend(results)
+        if memory is not None:
+            report['memory'].append({'rows': rows, **memory})
+    return report
+
+
+def save_report(report, results_dir=RESULTS_DIR):
+    """
+    Writes the report to results_dir as JSON, one file per run.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = report['started'].replace(':', '').replace('-', '')
+    path = os.path.join(results_dir, f"bench-{stamp}-{report['commit'] or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare_reports(old, new):
+    """
+    Returns a table of the min timings of 2 reports side by side, with
+    the speed-up (old / new) for every step both of them ran.
+    """
+    df_old = pd.DataFrame(old['results']).dropna(subset=['min_s'])
+    df_new = pd.DataFrame(new['results']).dropna(subset=['min_s'])
+    df_both = df_old.merge(df_new, on=['rows', 'step'], suffixes=(' old', ' new'))
+    df_both['speed-up'] = df_both['min_s old'] / df_both['min_s new']
+    return df_both[['rows', 'step', 'min_s old', 'min_s new', 'speed-up']]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the data loading and page computations at several scales.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SCALES, help="client-book sizes to run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per step (the fastest is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", help="an earlier report to compare this run against")
+    args = parser.parse_args()
+
+    report = run_suite(args.rows, repeat=args.repeat, seed=args.seed)
+    print(f"\nReport written to {save_report(report)}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare_reports(json.load(f), report).to_string(index=False))
@@ -0,0 +1,297 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from data_index import filter_rows
+from data_processing import cached_per_dataset
+
+# 1. DEFINE THE CHART SETTINGS
+# The charts in this module are drawn from small summaries computed here,
+# on the server, instead of handing Plotly every client row. The browser
+# then receives a few numbers per group, whatever the size of the book.
+# Box plots still show outliers, but at most this many per group.
+MAX_OUTLIERS_PER_GROUP = 100
+# "Nice" histogram bin widths (times a power of 10), as Plotly picks them.
+NICE_BIN_STEPS = [1, 2, 2.5, 5, 10]
+# Scatter plots are drawn as a grid of this many x by y cells, colored by
+# how many clients fall in each. Clients in cells with at most
+# SPARSE_CELL_MAX clients (the tails) are also drawn as dots, up to
+# MAX_SPARSE_POINTS of them.
+DENSITY_BINS = 60
+SPARSE_CELL_MAX = 2
+MAX_SPARSE_POINTS = 1000
+# Same colors Plotly Express uses, so the charts look the same as before.
+COLORS = px.colors.qualitative.Plotly
+
+
+# 2. BOX PLOTS
+def box_summary(df, x, y, max_outliers=MAX_OUTLIERS_PER_GROUP, seed=0):
+    """
+    Computes the numbers a box plot of y per x group is drawn from.
+    Returns (summary, outliers):
+    - summary: one row per group with 'count', 'q1', 'median', 'q3' and
+      the whisker ends 'lowerfence'/'upperfence' (the furthest values
+      within 1.5 x IQR of the box, like Plotly draws them).
+    - outliers: the x/y rows outside the whiskers, a random sample of at
+      most max_outliers per group (the same sample every time for a seed).
+    Quartiles use linear interpolation, Plotly's default.
+    """
+    data = df[[x, y]].dropna()
+    grouped = data.groupby(x, observed=True)[y]
+
+    summary = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    summary.columns = ['q1', 'median', 'q3']
+    summary.insert(0, 'count', grouped.size())
+
+    # Give every row its group's 1.5 x IQR limits, then keep the values
+    # inside them: their min and max are the whisker ends.
+    iqr = summary['q3'] - summary['q1']
+    row_low = (summary['q1'] - 1.5 * iqr).reindex(data[x]).to_numpy()
+    row_high = (summary['q3'] + 1.5 * iqr).reindex(data[x]).to_numpy()
+    values = data[y].to_numpy()
+    inside = (values >= row_low) & (values <= row_high)
+    data_inside = data[inside].groupby(x, observed=True)[y]
+    summary['lowerfence'] = data_inside.min()
+    summary['upperfence'] = data_inside.max()
+
+    outliers = data[~inside]
+    outliers = outliers.sample(frac=1, random_state=seed).groupby(x, observed=True).head(max_outliers)
+    return summary.reset_index(), outliers.reset_index(drop=True)
+
+
+# Computed once per version of the data and pair of columns.
+load_box_summary = cached_per_dataset(box_summary, max_entries=32)
+
+
+def box_figure(summary, outliers, x, y, title=None):
+    """
+    Draws a box plot from box_summary's output: one colored box per
+    group, built from its precomputed quartiles and whiskers, plus the
+    sampled outliers as dots in the same color.
+    """
+    fig = go.Figure()
+    for i, row in enumerate(summary.to_dict('records')):
+        group = row[x]
+        name = str(group)
+        color = COLORS[i % len(COLORS)]
+        fig.add_trace(go.Box(
+            x=[name], name=name, legendgroup=name, marker_color=color, boxpoints=False,
+            q1=[row['q1']], median=[row['median']], q3=[row['q3']],
+            lowerfence=[row['lowerfence']], upperfence=[row['upperfence']],
+        ))
+        points = outliers.loc[outliers[x] == group, y]
+        fig.add_trace(go.Scatter(
+            x=[name] * len(points), y=points, mode='markers', name=name, legendgroup=name,
+            showlegend=False, marker=dict(color=color, size=4),
+        ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y, legend_title_text=x)
+    return fig
+
+
+def box_chart(df, x, y, title=None):
+    """
+    A drop-in replacement for px.box(df, x=x, y=y, color=x, title=title)
+    that only sends the box summaries to the browser.
+    """
+    summary, outliers = load_box_summary(df, x, y)
+    return box_figure(summary, outliers, x, y, title=title)
+
+
+# 3. HISTOGRAMS
+def _nice_bin_width(span, nbins):
+    """
+    The smallest "nice" width (1, 2, 2.5 or 5 times a power of 10) that
+    covers span in at most nbins bins.
+    """
+    raw = span / nbins
+    if not raw > 0:
+        return 1.0
+    magnitude = 10 ** np.floor(np.log10(raw))
+    for step in NICE_BIN_STEPS:
+        if raw <= step * magnitude:
+            return float(step * magnitude)
+
+
+def histogram_counts(values, nbins):
+    """
+    Counts values (a Series) into at most nbins equal-width bins with
+    "nice" edges, like px.histogram(nbins=...) does in the browser.
+    Returns a DataFrame with one row per bin: 'start', 'end' and 'count'
+    (a bin holds start <= value < end; the last one also holds its end,
+    so the maximum doesn't get a bin of its own). Missing values are
+    skipped.
+    """
+    values = values.dropna().to_numpy(dtype=float)
+    if len(values) == 0:
+        return pd.DataFrame({'start': [], 'end': [], 'count': []})
+    low, high = values.min(), values.max()
+    width = _nice_bin_width(high - low, nbins)
+    first = np.floor(low / width) * width
+    if nbins < 2:
+        # One bin between the nice edges around the data (a single bin
+        # one width wide can't hold values on both sides of a multiple of it).
+        end = max(np.ceil(high / width) * width, first + width)
+        return pd.DataFrame({'start': [first], 'end': [end], 'count': [len(values)]})
+    # Rounding the start down can push the bins past nbins: widen them.
+    # Once width >= high - low, 2 bins always fit, so this stops.
+    while np.ceil((high - first) / width) > nbins:
+        width = _nice_bin_width(high - first, nbins)
+        first = np.floor(low / width) * width
+    n_bins = max(int(np.ceil((high - first) / width)), 1)
+    # One pass over the data: each value's bin number, then a bincount.
+    bins = np.minimum(((values - first) // width).astype(np.int64), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    starts = first + width * np.arange(len(counts))
+    return pd.DataFrame({'start': starts, 'end': starts + width, 'count': counts})
+
+
+def filtered_histogram(df, column, nbins, filters=None):
+    """
+    histogram_counts for df[column] over the rows matching filters, an
+    optional {column: value} dictionary applied through the bitmap index
+    (see data_index.select).
+    """
+    df = filter_rows(df, filters) if filters else df
+    return histogram_counts(df[column], nbins)
+
+
+# Computed once per version of the data and filter state.
+load_histogram = cached_per_dataset(filtered_histogram, max_entries=64)
+
+
+def histogram_figure(counts, column, title=None):
+    """
+    Draws histogram_counts' output as touching bars: a few numbers per
+    bin reach the browser instead of every value.
+    """
+    fig = go.Figure(go.Bar(
+        x=(counts['start'] + counts['end']) / 2,
+        y=counts['count'],
+        width=counts['end'] - counts['start'],
+        customdata=counts[['start', 'end']],
+        hovertemplate=f'{column}=%{{customdata[0]:,}} - %{{customdata[1]:,}}<br>count=%{{y:,}}<extra></extra>',
+        marker_color=COLORS[0],
+    ))
+    fig.update_layout(title=title, xaxis_title=column, yaxis_title='count', bargap=0)
+    return fig
+
+
+def histogram_chart(df, column, nbins, title=None, filters=None):
+    """
+    A drop-in replacement for px.histogram(df, x=column, nbins=nbins,
+    title=title) that bins the data on the server.
+    """
+    return histogram_figure(load_histogram(df, column, nbins, filters), column, title=title)
+
+
+# 4. DENSITY SCATTER PLOTS
+def _bin_numbers(values, low, high, nbins):
+    """
+    The grid column (0 .. nbins-1) each value falls in, for nbins
+    equal-width bins from low to high (high itself goes in the last bin).
+    """
+    if high > low:
+        bins = ((values - low) * (nbins / (high - low))).astype(np.int64)
+    else:
+        bins = np.zeros(len(values), dtype=np.int64)
+    return np.minimum(bins, nbins - 1)
+
+
+def density_grid(df, x, y, bins=DENSITY_BINS, color=None, seed=0):
+    """
+    Counts all rows of df into a bins x bins grid over the x/y ranges.
+    Unlike df.sample(...), every client counts and the result is the
+    same on every run. Returns a dictionary with:
+    - 'x_edges', 'y_edges': the grid lines (bins + 1 each).
+    - 'counts': the number of clients per cell, shape (bins, bins), rows
+      along y as Plotly's heatmap expects.
+    - 'sparse': the x/y (and color) values of clients in nearly empty
+      cells, a seeded sample of at most MAX_SPARSE_POINTS, so the tails
+      stay visible.
+    - 'color_levels': every value of the color column (its categories),
+      so each one keeps its color whichever of them the sample holds.
+    """
+    columns = [x, y] + ([color] if color else [])
+    data = df[columns].dropna(subset=[x, y])
+    color_levels = []
+    if color:
+        values = df[color]
+        color_levels = list(values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype)
+                            else np.sort(values.dropna().unique()))
+    xs = data[x].to_numpy(dtype=float)
+    ys = data[y].to_numpy(dtype=float)
+    if len(data) == 0:
+        edges = np.linspace(0.0, 1.0, bins + 1)
+        return {'x_edges': edges, 'y_edges': edges, 'counts': np.zeros((bins, bins), dtype=np.int64),
+                'sparse': data, 'color_levels': color_levels}
+
+    x_low, x_high = xs.min(), xs.max()
+    y_low, y_high = ys.min(), ys.max()
+    # One pass: each client's cell number, then a bincount over the cells.
+    cells = _bin_numbers(ys, y_low, y_high, bins) * bins + _bin_numbers(xs, x_low, x_high, bins)
+    counts = np.bincount(cells, minlength=bins * bins)
+
+    sparse = data[counts[cells] <= SPARSE_CELL_MAX]
+    if len(sparse) > MAX_SPARSE_POINTS:
+        sparse = sparse.sample(MAX_SPARSE_POINTS, random_state=seed)
+    return {
+        'x_edges': np.linspace(x_low, x_high, bins + 1),
+        'y_edges': np.linspace(y_low, y_high, bins + 1),
+        'counts': counts.reshape(bins, bins),
+        'sparse': sparse.reset_index(drop=True),
+        'color_levels': color_levels,
+    }
+
+
+# Computed once per version of the data and set of columns.
+load_density_grid = cached_per_dataset(density_grid, max_entries=32)
+
+
+def density_figure(grid, x, y, title=None, color=None, line=None):
+    """
+    Draws density_grid's output: a heatmap of clients per cell (empty
+    cells left blank) with the sparse tail clients on top as dots,
+    colored by the color column if one was given.
+    line is an optional (slope, intercept) fit to draw across the chart.
+    """
+    counts = grid['counts'].astype(float)
+    counts[counts == 0] = np.nan
+    x_mid = (grid['x_edges'][:-1] + grid['x_edges'][1:]) / 2
+    y_mid = (grid['y_edges'][:-1] + grid['y_edges'][1:]) / 2
+    fig = go.Figure(go.Heatmap(
+        x=x_mid, y=y_mid, z=counts, colorscale='Blues', colorbar=dict(title='Clients'),
+        hovertemplate=f'{x}=%{{x:,.0f}}<br>{y}=%{{y:,.0f}}<br>clients=%{{z:,}}<extra></extra>',
+    ))
+
+    sparse = grid['sparse']
+    groups = [(None, sparse)] if not color else list(sparse.groupby(color, observed=True))
+    # Colors follow the full list of levels, not the ones in the sample.
+    levels = {level: i for i, level in enumerate(grid['color_levels'])}
+    for group, points in groups:
+        i = levels.get(group, 0)
+        fig.add_trace(go.Scatter(
+            x=points[x], y=points[y], mode='markers',
+            name=str(group) if color else 'Sparse clients', showlegend=bool(color),
+            marker=dict(color=COLORS[i % len(COLORS)], size=4),
+        ))
+
+    if line is not None:
+        slope, intercept = line
+        x_ends = grid['x_edges'][[0, -1]]
+        fig.add_trace(go.Scatter(
+            x=x_ends, y=slope * x_ends + intercept, mode='lines', name='Fit',
+            line=dict(color='#ef553b', width=2),
+        ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y, legend_title_text=color)
+    return fig
+
+
+def density_chart(df, x, y, title=None, color=None, line=None):
+    """
+    Replacement for px.scatter(df.sample(1000), x=x, y=y, color=color):
+    every client is counted into a density grid on the server, so the
+    chart is the same on every run and costs the same at any size.
+    """
+    grid = load_density_grid(df, x, y, color=color)
+    return density_figure(grid, x, y, title=title, color=color, line=line)
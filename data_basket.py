@@ -0,0 +1,298 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_processing import PRODUCT_COLS, SNAPSHOT_DIR, cached_aggregate, cached_per_dataset, load_or_build
+
+# 1. PACK THE BASKETS
+# With 6 products, the set of products a client holds fits in 6 bits:
+# bit 0 is PRODUCT_COLS[0] ('Bank Loans'), bit 1 is PRODUCT_COLS[1], and so
+# on. Every client is then one number from 0 to 63 (the 'Product Code'
+# column, added at load time), and counting how many clients hold each of
+# the 64 possible baskets is a single np.bincount.
+N_BASKETS = 2 ** len(PRODUCT_COLS)
+
+# The client segments the advisors want their own rules for.
+SEGMENT_COLS = [
+    'Investment Advisor', 'Banking Relationship', 'Loyalty Classification',
+    'Income Band', 'Nationality'
+]
+
+
+def basket_codes(df):
+    """
+    The 6-bit basket number of every row of df.
+    """
+    return df['Product Code'].to_numpy()
+
+
+def build_basket_counts(df):
+    """
+    Counts the rows of df holding each of the 64 baskets.
+    Returns a DataFrame indexed by basket number with a 'clients' column.
+    """
+    counts = np.bincount(basket_codes(df), minlength=N_BASKETS)
+    return pd.DataFrame({'clients': counts}, index=pd.RangeIndex(N_BASKETS, name='basket'))
+
+
+def _update_basket_counts(previous, df_new):
+    """
+    Adds the basket counts of newly appended rows to existing ones.
+    """
+    return previous + build_basket_counts(df_new)
+
+
+def product_bits(products):
+    """
+    The basket number holding exactly the given products.
+    """
+    return sum(1 << PRODUCT_COLS.index(product) for product in products)
+
+
+def basket_products(basket):
+    """
+    The names of the products in a basket number, in PRODUCT_COLS order.
+    """
+    return tuple(product for bit, product in enumerate(PRODUCT_COLS) if basket >> bit & 1)
+
+
+# 2. SUPPORT OF EVERY ITEMSET
+def itemset_counts(counts):
+    """
+    For every itemset (also a 6-bit number), the number of clients holding
+    at least those products: the sum of the counts of every basket that
+    contains it. Works one bit at a time, so it is 6 vectorized steps.
+    """
+    totals = np.asarray(counts, dtype=np.int64).copy()
+    itemsets = np.arange(N_BASKETS)
+    for bit in range(len(PRODUCT_COLS)):
+        without_bit = itemsets[(itemsets >> bit & 1) == 0]
+        totals[without_bit] += totals[without_bit | 1 << bit]
+    return totals
+
+
+# 3. EVERY ASSOCIATION RULE
+def build_rule_table(counts):
+    """
+    Every rule "antecedents -> consequents" between 2 non-overlapping,
+    non-empty product sets that at least one client holds together, with
+    the same support, confidence and lift as mlxtend's association_rules.
+    Returns a DataFrame sorted by confidence, highest first.
+    """
+    n = np.sum(counts)
+    support = itemset_counts(counts) / n
+    # All pairs of antecedent and consequent, as 2 grids of basket numbers.
+    antecedent, consequent = np.meshgrid(np.arange(N_BASKETS), np.arange(N_BASKETS), indexing='ij')
+    itemset = antecedent | consequent
+    valid = (antecedent > 0) & (consequent > 0) & (antecedent & consequent == 0) & (support[itemset] > 0)
+    antecedent, consequent, itemset = antecedent[valid], consequent[valid], itemset[valid]
+
+    rules = pd.DataFrame({
+        'antecedents': [basket_products(a) for a in antecedent],
+        'consequents': [basket_products(c) for c in consequent],
+        'antecedent support': support[antecedent],
+        'consequent support': support[consequent],
+        'support': support[itemset],
+    })
+    rules['confidence'] = rules['support'] / rules['antecedent support']
+    rules['lift'] = rules['confidence'] / rules['consequent support']
+    return rules.sort_values('confidence', ascending=False, ignore_index=True)
+
+
+def filter_rules(rules, min_support, min_lift=1.0):
+    """
+    The rules whose itemset is frequent (support of at least min_support)
+    and whose lift is at least min_lift, like running apriori and then
+    association_rules(metric="lift") on the clients.
+    """
+    return rules[(rules['support'] >= min_support) & (rules['lift'] >= min_lift)]
+
+
+# 4. CACHE THE COUNTS AND RULES
+# The 64 counts are stored next to the snapshot and updated with just the
+# appended rows; the rule table is derived from them once per version of
+# the data, so moving the support slider only filters it.
+def stored_basket_counts(df):
+    """
+    Returns build_basket_counts for the clean frame df, stored next to
+    the snapshot.
+    """
+    return cached_aggregate('baskets', df, build_basket_counts, _update_basket_counts)
+
+
+def basket_rule_table(df):
+    """
+    build_rule_table for the clean frame df, from its stored basket counts.
+    """
+    return build_rule_table(stored_basket_counts(df)['clients'].to_numpy())
+
+
+load_basket_counts = cached_per_dataset(stored_basket_counts)
+load_rule_table = cached_per_dataset(basket_rule_table)
+
+
+# 5. RULES PER SEGMENT
+# Every segment (e.g. Investment Advisor = 'Victor Dean') only needs its
+# own 64 basket counts. Numbering each row "segment value * 64 + basket"
+# counts every value of a segment column in one np.bincount, so all
+# segments of the book take 5 passes, one per column in SEGMENT_COLS.
+def build_segment_basket_counts(df, segments=SEGMENT_COLS):
+    """
+    Counts the rows of df holding each basket, for every value of every
+    segment column. Returns a long DataFrame with the columns segment,
+    value, basket and clients (values without any rows are left out).
+    """
+    codes = basket_codes(df).astype(np.int64)
+    parts = []
+    for col in segments:
+        values = df[col].cat.categories
+        segment_codes = df[col].cat.codes.to_numpy()
+        valid = segment_codes >= 0
+        counts = np.bincount(
+            segment_codes[valid].astype(np.int64) * N_BASKETS + codes[valid],
+            minlength=len(values) * N_BASKETS
+        ).reshape(len(values), N_BASKETS)
+        used = counts.sum(axis=1) > 0
+        parts.append(pd.DataFrame({
+            'segment': col,
+            'value': np.repeat(values[used].astype(str), N_BASKETS),
+            'basket': np.tile(np.arange(N_BASKETS), used.sum()),
+            'clients': counts[used].ravel(),
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def _update_segment_basket_counts(previous, df_new):
+    """
+    Adds the segment basket counts of newly appended rows to existing
+    ones (a segment value first seen in the new rows is added).
+    """
+    df_both = pd.concat([previous, build_segment_basket_counts(df_new)], ignore_index=True)
+    return df_both.groupby(['segment', 'value', 'basket'], sort=False, as_index=False)['clients'].sum()
+
+
+def build_segment_rule_table(segment_counts):
+    """
+    build_rule_table for every segment value, stacked into one table with
+    the segment, value and number of clients in it as the first columns.
+    Support is measured within the segment, e.g. the share of Victor
+    Dean's clients holding both products.
+    """
+    tables = []
+    for (segment, value), df_counts in segment_counts.groupby(['segment', 'value'], sort=False):
+        counts = np.zeros(N_BASKETS, dtype=np.int64)
+        counts[df_counts['basket'].to_numpy()] = df_counts['clients'].to_numpy()
+        rules = build_rule_table(counts)
+        rules.insert(0, 'segment', segment)
+        rules.insert(1, 'value', value)
+        rules.insert(2, 'clients', counts.sum())
+        tables.append(rules)
+    return pd.concat(tables, ignore_index=True)
+
+
+def segment_rule_table(df):
+    """
+    Returns build_segment_rule_table for the clean frame df. The segment
+    basket counts are stored next to the snapshot, so the rules are mined
+    once per version of the data and the page only filters and sorts them.
+    """
+    segment_counts = cached_aggregate(
+        'segment-baskets', df, build_segment_basket_counts, _update_segment_basket_counts
+    )
+    return build_segment_rule_table(segment_counts)
+
+
+load_segment_rule_table = cached_per_dataset(segment_rule_table)
+
+
+# 6. CROSS-SELL COUNTS
+# A client "has every product in have and none in not_have" exactly when
+# code & (have | not_have) == have. There are 3^6 = 729 such (have,
+# not_have) combinations (each product is wanted, unwanted or either), and
+# the client count of each one follows from the 64 basket counts.
+def cross_sell_positions(df, have, not_have):
+    """
+    The row positions of the clients of df that hold every product in
+    have and none in not_have (both lists of product names). A product in
+    both lists matches no client.
+    """
+    have_bits, not_have_bits = product_bits(have), product_bits(not_have)
+    if have_bits & not_have_bits:
+        return np.array([], dtype=np.intp)
+    return np.flatnonzero((basket_codes(df) & (have_bits | not_have_bits)) == have_bits)
+
+
+def build_cross_sell_counts(counts):
+    """
+    The number of clients for all 729 (have, not_have) combinations.
+    Returns a DataFrame indexed by the 2 basket numbers with a 'clients'
+    column (a product in both has no clients, so those pairs are left out).
+    """
+    counts = np.asarray(counts)
+    have, not_have = np.meshgrid(np.arange(N_BASKETS), np.arange(N_BASKETS), indexing='ij')
+    valid = (have & not_have) == 0
+    have, not_have = have[valid], not_have[valid]
+    # One row per combination, one column per basket: does it match?
+    baskets = np.arange(N_BASKETS)
+    matches = (baskets & (have | not_have)[:, None]) == have[:, None]
+    index = pd.MultiIndex.from_arrays([have, not_have], names=['have', 'not_have'])
+    return pd.DataFrame({'clients': matches @ counts}, index=index)
+
+
+def product_penetration(counts):
+    """
+    The number of clients holding each product, from the 64 basket
+    counts. Returns a Series indexed by product name.
+    """
+    totals = itemset_counts(counts)
+    return pd.Series([totals[1 << bit] for bit in range(len(PRODUCT_COLS))], index=PRODUCT_COLS)
+
+
+def cross_sell_table(df):
+    """
+    build_cross_sell_counts for the clean frame df, from its stored basket
+    counts.
+    """
+    return build_cross_sell_counts(stored_basket_counts(df)['clients'].to_numpy())
+
+
+load_cross_sell_counts = cached_per_dataset(cross_sell_table)
+
+
+def cross_sell_count(cross_sell_counts, have, not_have):
+    """
+    Looks up the number of clients with every product in have and none in
+    not_have in build_cross_sell_counts' table.
+    """
+    key = (product_bits(have), product_bits(not_have))
+    if key not in cross_sell_counts.index:
+        return 0
+    return int(cross_sell_counts.loc[key, 'clients'])
+
+
+# 7. BATCH MODE
+# Mines the rules of every segment outside the app, e.g. from a nightly
+# job after the data files are refreshed. It also stores the segment
+# basket counts next to the snapshot, so the app starts warm.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mine product association rules for every client segment.")
+    parser.add_argument("--data-dir", default=".", help="folder with the data files")
+    parser.add_argument("--out", default="segment_rules.csv", help="CSV file to write the rules to")
+    parser.add_argument("--min-support", type=float, default=0.0)
+    parser.add_argument("--min-lift", type=float, default=1.0)
+    args = parser.parse_args()
+
+    snapshot_dir = os.path.join(args.data_dir, SNAPSHOT_DIR)
+    df = load_or_build(args.data_dir, snapshot_dir)
+    segment_counts = cached_aggregate(
+        'segment-baskets', df, build_segment_basket_counts, _update_segment_basket_counts,
+        snapshot_dir=snapshot_dir
+    )
+    rules = filter_rules(build_segment_rule_table(segment_counts), args.min_support, args.min_lift)
+    rules.assign(
+        antecedents=rules['antecedents'].str.join(', '),
+        consequents=rules['consequents'].str.join(', ')
+    ).to_csv(args.out, index=False)
+    print(f"Wrote {len(rules):,} rules for {len(rules[['segment', 'value']].drop_duplicates())} segments to {args.out}")
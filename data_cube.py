@@ -0,0 +1,138 @@
+import itertools
+
+import pandas as pd
+
+from data_processing import (
+    AGGREGATE_MEASURES,
+    aggregate_frame,
+    cached_aggregate,
+    cached_per_dataset,
+    combine_aggregates,
+    load_and_clean_data,
+    load_client_aggregates,
+    too_large_to_load,
+)
+
+# 1. DEFINE THE CUBE FILTERS
+# The 3 dropdown filters shared by the Home, Loan, Deposit and Summary pages.
+# The cube itself is grouped by all of data_processing.AGGREGATE_DIMENSIONS,
+# so every chart that groups by one of them is a roll-up of the cube.
+CUBE_FILTERS = ['Banking Relationship', 'Gender', 'Investment Advisor']
+ALL = 'All'
+
+
+def _update_cube(previous, df_new):
+    """
+    Adds the sums of newly appended rows to an existing cube.
+    """
+    return combine_aggregates([previous, aggregate_frame(df_new)])
+
+
+def build_distinct_clients(df):
+    """
+    Counts the distinct 'Client ID's for every combination of
+    CUBE_FILTERS, including 'All' for any of them.
+    A client can appear on more than one row, so distinct counts can't be
+    added up from the cube like the money columns; with 3 filters there are
+    only a few hundred combinations, so we simply count them all up front.
+    """
+    parts = []
+    for r in range(len(CUBE_FILTERS) + 1):
+        for dims in itertools.combinations(CUBE_FILTERS, r):
+            if dims:
+                counts = df.groupby(list(dims), observed=True)['Client ID'].nunique().reset_index(name='Total Clients')
+            else:
+                counts = pd.DataFrame({'Total Clients': [df['Client ID'].nunique()]})
+            for col in CUBE_FILTERS:
+                if col not in dims:
+                    counts[col] = ALL
+            parts.append(counts[CUBE_FILTERS + ['Total Clients']])
+    df_counts = pd.concat(parts, ignore_index=True)
+    return df_counts.astype({col: str for col in CUBE_FILTERS})
+
+
+# 2. CACHE THE CUBE
+def stored_kpi_cube(df):
+    """
+    Returns (cube, distinct_clients) for the clean frame df.
+    cube has one row per combination of AGGREGATE_DIMENSIONS with the
+    summed AGGREGATE_MEASURES and a 'Client Count'. Both are stored next
+    to the snapshot, so they are built once per version of the data.
+    """
+    cube = cached_aggregate('kpi_cube', df, aggregate_frame, _update_cube)
+    distinct = cached_aggregate('distinct_clients', df, build_distinct_clients)
+    return cube, distinct
+
+
+load_kpi_cube = cached_per_dataset(stored_kpi_cube)
+
+
+def load_page_cube():
+    """
+    Returns the cube for the pages that need nothing else (no distinct
+    client counts or client rows). When the main file is too large to
+    load (see data_processing.FULL_LOAD_LIMIT_MB), it is streamed through
+    load_client_aggregates and the client book is never held in memory;
+    otherwise it comes from load_kpi_cube on the shared frame.
+    Returns an empty DataFrame if the data can't be loaded.
+    """
+    if too_large_to_load():
+        return load_client_aggregates()
+    df = load_and_clean_data()
+    if df.empty:
+        return df
+    cube, _ = load_kpi_cube(df)
+    return cube
+
+
+# 3. QUERY THE CUBE
+def slice_cube(cube, filters):
+    """
+    Keeps the cube rows that match filters, a {column: value} dictionary.
+    A value of 'All' (or None) means "don't filter on this column".
+    """
+    mask = pd.Series(True, index=cube.index)
+    for col, value in filters.items():
+        if value is not None and value != ALL:
+            mask &= cube[col] == value
+    return cube[mask]
+
+
+def cube_totals(df_cube):
+    """
+    Adds up every measure of a (sliced) cube, giving the KPI tile values.
+    """
+    return df_cube[AGGREGATE_MEASURES + ['Client Count']].sum()
+
+
+def frame_totals(df):
+    """
+    Same result as cube_totals, but added up straight from client rows.
+    Used for selections the cube doesn't cover, like a single client or a
+    'Joined Bank' time window.
+    """
+    totals = df[AGGREGATE_MEASURES].sum()
+    totals['Client Count'] = len(df)
+    return totals
+
+
+def cube_rollup(df_cube, by, measures):
+    """
+    Rolls a (sliced) cube up to the `by` column(s), summing `measures`.
+    Gives the same result as df.groupby(by)[measures].sum().reset_index()
+    on the client rows, but only touches the cube.
+    """
+    return df_cube.groupby(by, observed=True)[measures].sum().reset_index()
+
+
+def distinct_client_count(distinct, filters):
+    """
+    Looks up the number of distinct clients for the CUBE_FILTERS
+    selection in filters (missing columns count as 'All').
+    """
+    mask = pd.Series(True, index=distinct.index)
+    for col in CUBE_FILTERS:
+        value = filters.get(col)
+        mask &= distinct[col] == (ALL if value is None else str(value))
+    matches = distinct.loc[mask, 'Total Clients']
+    return int(matches.iloc[0]) if len(matches) else 0
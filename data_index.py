@@ -0,0 +1,315 @@
+import numpy as np
+import pandas as pd
+
+from data_processing import cached_per_dataset, filtered_view
+
+# 1. DEFINE THE INDEXED COLUMNS
+# The category columns the pages filter on. For every value of each one we
+# keep a bitmap: one bit per client row, set if the row has that value.
+INDEXED_COLUMNS = [
+    'Gender', 'Banking Relationship', 'Investment Advisor',
+    'Loyalty Classification', 'Fee Structure', 'Nationality', 'Income Band'
+]
+ALL = 'All'
+
+
+# 2. BUILD THE INDEX
+def build_filter_index(df, columns=INDEXED_COLUMNS):
+    """
+    Builds the bitmap index for df.
+    Returns a dictionary with the number of rows and, per column, a
+    {value: bitmap} dictionary. A bitmap is a NumPy uint8 array made with
+    np.packbits, so it takes 1 bit per row instead of 1 byte.
+    Bitmaps are combined with the normal NumPy operators:
+    a & b (AND), a | b (OR), and bitmap_not(index, a) (NOT).
+    """
+    n_rows = len(df)
+    index = {
+        'rows': n_rows,
+        # All valid bits set. Needed for NOT, because packbits pads the
+        # last byte with zero bits that must stay zero.
+        'all': np.packbits(np.ones(n_rows, dtype=bool)),
+        'bitmaps': {},
+    }
+    for col in columns:
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes = df[col].cat.codes.to_numpy()
+            values = df[col].cat.categories
+        else:
+            codes, values = pd.factorize(df[col])
+        index['bitmaps'][col] = {
+            value: np.packbits(codes == code)
+            for code, value in enumerate(values)
+        }
+    return index
+
+
+# 3. COMBINE BITMAPS
+def empty_bitmap(index):
+    """
+    A bitmap with no rows selected.
+    """
+    return np.zeros_like(index['all'])
+
+
+def lookup(index, col, value):
+    """
+    Returns the bitmap of rows where col == value
+    (an empty bitmap if the value never occurs).
+    """
+    return index['bitmaps'][col].get(value, empty_bitmap(index))
+
+
+def any_of(index, col, values):
+    """
+    OR of the bitmaps of several values of one column.
+    """
+    bits = empty_bitmap(index)
+    for value in values:
+        bits = bits | lookup(index, col, value)
+    return bits
+
+
+def bitmap_not(index, bits):
+    """
+    NOT of a bitmap: every row that is not selected in bits.
+    """
+    return ~bits & index['all']
+
+
+def select(index, filters):
+    """
+    AND of all filters, a {column: value} dictionary.
+    A value can be a single value, a list of values (OR-ed together), or
+    'All'/None to not filter on that column.
+    """
+    bits = index['all']
+    for col, value in filters.items():
+        if value is None or (isinstance(value, str) and value == ALL):
+            continue
+        if isinstance(value, (list, tuple, set)):
+            bits = bits & any_of(index, col, value)
+        else:
+            bits = bits & lookup(index, col, value)
+    return bits
+
+
+def bitmap_positions(index, bits):
+    """
+    Returns the row positions that are set in bits, in ascending order.
+    """
+    return np.flatnonzero(np.unpackbits(bits, count=index['rows']))
+
+
+def bitmap_count(index, bits):
+    """
+    Returns how many rows are set in bits.
+    """
+    return int(np.unpackbits(bits, count=index['rows']).sum())
+
+
+def positions_bitmap(index, positions):
+    """
+    Turns a list of row positions (e.g. a date window) into a bitmap,
+    so it can be AND-ed with the category filters.
+    """
+    mask = np.zeros(index['rows'], dtype=bool)
+    mask[positions] = True
+    return np.packbits(mask)
+
+
+# 4. DATE INDEX ON 'Joined Bank'
+# The row positions sorted by date. Any date range is then 2 binary searches
+# (np.searchsorted) and a slice of that list, instead of comparing the
+# date of every row.
+def build_date_index(df, col='Joined Bank'):
+    """
+    Builds the sorted date index for col.
+    Returns a dictionary with 'order' (row positions sorted by date),
+    'dates' (the dates in that same order) and 'rows'.
+    Rows without a date are left out, as no date range can match them.
+    """
+    dates = df[col].to_numpy()
+    valid = np.flatnonzero(~np.isnat(dates))
+    order = valid[np.argsort(dates[valid], kind='stable')]
+    return {'order': order, 'dates': dates[order], 'rows': len(df)}
+
+
+def _to_datetime64(value, dates):
+    """
+    Converts a date-like value to the same datetime64 unit as dates.
+    """
+    return np.datetime64(pd.Timestamp(value)).astype(dates.dtype)
+
+
+def date_range_positions(date_index, start=None, end=None):
+    """
+    Returns the row positions with start <= date <= end, in row order.
+    start or end can be None for an open-ended range.
+    """
+    dates = date_index['dates']
+    lo = 0 if start is None else np.searchsorted(dates, _to_datetime64(start, dates), side='left')
+    hi = len(dates) if end is None else np.searchsorted(dates, _to_datetime64(end, dates), side='right')
+    return np.sort(date_index['order'][lo:hi])
+
+
+def last_days_positions(date_index, days):
+    """
+    Returns the rows that joined in the last `days` days before the
+    latest date in the data (the Home page's "Last 30 D" etc.).
+    """
+    if len(date_index['dates']) == 0:
+        return np.array([], dtype=np.int64)
+    latest = pd.Timestamp(date_index['dates'][-1])
+    return date_range_positions(date_index, start=latest - pd.Timedelta(days=days))
+
+
+def rolling_window_counts(date_index, window_days, freq='MS'):
+    """
+    Counts the rows in a rolling window of window_days days, ending on
+    every date of a pd.date_range with the given freq (default: month
+    starts) across the data. All windows are answered with 2 vectorized
+    binary searches. Returns a DataFrame with 'Window End' and 'Clients'.
+    """
+    dates = date_index['dates']
+    if len(dates) == 0:
+        return pd.DataFrame({'Window End': [], 'Clients': []})
+    ends = pd.date_range(pd.Timestamp(dates[0]), pd.Timestamp(dates[-1]) + pd.Timedelta(days=1), freq=freq)
+    ends_64 = ends.to_numpy().astype(dates.dtype)
+    starts_64 = (ends - pd.Timedelta(days=window_days)).to_numpy().astype(dates.dtype)
+    hi = np.searchsorted(dates, ends_64, side='right')
+    lo = np.searchsorted(dates, starts_64, side='left')
+    return pd.DataFrame({'Window End': ends, 'Clients': hi - lo})
+
+
+# 5. CACHE THE INDEXES
+# st.cache_resource keeps ONE shared copy of the index for all users,
+# instead of handing every rerun its own copy. The index is never changed
+# after it is built, so sharing it is safe.
+load_filter_index = cached_per_dataset(build_filter_index, resource=True)
+load_date_index = cached_per_dataset(build_date_index, resource=True)
+
+
+def filter_rows(df, filters, within=None):
+    """
+    Returns the rows of df matching filters (see select), found through
+    the bitmap index instead of comparing every row's text.
+    within optionally limits the result to these row positions,
+    e.g. a date window from date_range_positions.
+    """
+    index = load_filter_index(df)
+    bits = select(index, filters)
+    if within is not None:
+        bits = bits & positions_bitmap(index, within)
+    return filtered_view(df, bitmap_positions(index, bits))
+
+
+# 6. PREFIX INDEX ON TEXT COLUMNS
+# The values of a text column (e.g. 'Name') in lower case, sorted, with
+# the row position of each. All values starting with some text are then
+# one contiguous slice, found with 2 binary searches, so search-as-you-type
+# costs O(log n) per keystroke instead of a scan of every client.
+def search_index(df, column):
+    """
+    Builds the prefix index of a text column of df.
+    Returns (keys, positions): the sorted lower-case values and the row
+    position each one came from.
+    """
+    keys = df[column].fillna('').astype(str).str.lower().to_numpy(dtype=object)
+    order = np.argsort(keys, kind='stable')
+    return keys[order], order
+
+
+def prefix_range(keys, prefix):
+    """
+    The start and end of the slice of sorted keys that start with prefix.
+    """
+    prefix = prefix.lower()
+    # Every string starting with prefix sorts before prefix + the highest
+    # character.
+    start = np.searchsorted(keys, prefix, side='left')
+    end = np.searchsorted(keys, prefix + '\U0010ffff', side='left')
+    return int(start), int(end)
+
+
+# One shared index per version of the data and column (see section 5).
+load_search_index = cached_per_dataset(search_index, resource=True, max_entries=8)
+
+
+def prefix_positions(df, column, prefix, limit=None):
+    """
+    The row positions of df whose column starts with prefix (ignoring
+    case), in order of the column; at most limit of them if given.
+    """
+    keys, positions = load_search_index(df, column)
+    start, end = prefix_range(keys, prefix)
+    if limit is not None:
+        end = min(end, start + limit)
+    return positions[start:end]
+
+
+# 7. HASH INDEX ON 'Client ID'
+# One entry per distinct Client ID, pointing at that client's rows (a
+# client can appear on more than one row). Looking a client up is a hash
+# table lookup, O(1), instead of comparing every row.
+MAX_SUGGESTIONS = 20
+
+
+def build_client_index(df, col='Client ID'):
+    """
+    Builds the Client ID index for df.
+    Returns a dictionary with:
+    - 'ids': a pandas Index of the distinct IDs (hash based, unique).
+    - 'order' and 'starts': the rows of the i-th ID are
+      order[starts[i]:starts[i + 1]].
+    """
+    codes, ids = pd.factorize(df[col])
+    valid = codes >= 0
+    order = np.flatnonzero(valid)[np.argsort(codes[valid], kind='stable')]
+    starts = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[valid], minlength=len(ids)), out=starts[1:])
+    ids = pd.Index(ids)
+    # Build the hash table now, once, rather than on the first lookup.
+    if len(ids):
+        ids.get_loc(ids[0])
+    return {'ids': ids, 'order': order, 'starts': starts}
+
+
+# One shared index per version of the data (see section 5).
+load_client_index = cached_per_dataset(build_client_index, resource=True)
+
+
+def client_positions(df, client_id):
+    """
+    The row positions of the client with this Client ID (empty if there
+    is none).
+    """
+    index = load_client_index(df)
+    try:
+        i = index['ids'].get_loc(client_id)
+    except KeyError:
+        return np.array([], dtype=np.int64)
+    return index['order'][index['starts'][i]:index['starts'][i + 1]]
+
+
+def client_suggestions(df, text, limit=MAX_SUGGESTIONS):
+    """
+    The clients whose Name or Client ID starts with text, for a
+    search-as-you-type box: Name matches first (in name order), then
+    Client ID matches, at most limit distinct clients.
+    Returns a DataFrame with 'Client ID' and 'Name', one row per client,
+    so 2 clients with the same name can be told apart by their ID.
+    """
+    text = text.strip()
+    if not text:
+        return pd.DataFrame(columns=['Client ID', 'Name'])
+    # A client on several rows can match more than once, so ask for a few
+    # extra before dropping the repeats.
+    positions = np.concatenate([
+        prefix_positions(df, 'Name', text, limit * 2),
+        prefix_positions(df, 'Client ID', text, limit * 2),
+    ])
+    df_matches = filtered_view(df, positions, ['Client ID', 'Name'])
+    return df_matches.drop_duplicates('Client ID').head(limit).reset_index(drop=True)
@@ -1,90 +1,852 @@
+import functools
+import hashlib
+import json
+import os
+
 import pandas as pd
 import numpy as np
 import streamlit as st
 
-# 1. CACHE THE DATA
-# This @st.cache_data decorator tells Streamlit to run this function
-# only ONCE. After the first run, it saves the result in memory.
-# This makes the app super fast, as we don't reload and clean the
-# data every time a user clicks a filter.
-@st.cache_data
+from profiling import profile_step
+
+# 1. DEFINE FILE NAMES
+# The 4 raw data files, relative to the folder the app is started from.
+SOURCE_FILES = {
+    "main": "Banking.csv",
+    "gender": "gender.csv",
+    "relationship": "banking-realtionships.csv",
+    "advisor": "investment-advisiors.csv",
+}
+
+# Where the cleaned, ready-to-use snapshots are written.
+# Bump SNAPSHOT_VERSION whenever the cleaning logic below changes, so old
+# snapshots are never mistaken for the output of the new code.
+SNAPSHOT_DIR = ".snapshots"
+SNAPSHOT_VERSION = 6
+SNAPSHOT_MANIFEST = "manifest.json"
+
+# 2. DEFINE THE SCHEMA (DTYPE PLAN)
+# Text columns with only a handful of distinct values are stored as
+# 'category': each row then holds a small integer code instead of its own
+# copy of the string. 'Name' is (almost) unique per client, so it stays text.
+CATEGORICAL_COLS = [
+    'Nationality', 'Occupation', 'Fee Structure', 'Loyalty Classification',
+    'Gender', 'Banking Relationship', 'Investment Advisor', 'Banking Contact'
+]
+# Small whole numbers don't need 8 bytes each.
+# Money columns stay float64: float32 only keeps ~7 significant digits,
+# which is not enough for cents on balances in the millions.
+SMALL_INT_COLS = {
+    'Age': 'int8',
+    'Properties Owned': 'int8',
+    'Risk Weighting': 'int8',
+    'Amount of Credit Cards': 'int8',
+}
+
+# 'Joined Bank' is written day-first, e.g. "06-05-2019" is 6 May 2019.
+# Declaring it avoids pandas guessing (slow, and it can guess month-first).
+JOINED_BANK_FORMAT = "%d-%m-%Y"
+
+# The "as-of" date 'Engagment Days' is counted up to, e.g. "2021-12-31".
+# Leave it unset to use the latest 'Joined Bank' date in the data. Either
+# way the result only depends on the data and this setting, never on the
+# day the app happens to run, so snapshots can be reused across restarts.
+AS_OF_DATE = os.environ.get("BANKING_AS_OF_DATE") or None
+
+# The bins used for the 2 engineered category columns.
+ENGAGEMENT_BINS = [-float('inf'), 365, 1825, 3650, 7300, float('inf')]
+ENGAGEMENT_LABELS = ["< 1 Years", "< 5 Years", "< 10 Years", "< 20 Years", "> 20 Years"]
+INCOME_BINS = [-float('inf'), 100000, 300000, float('inf')]
+INCOME_LABELS = ["Low", "Mid", "High"]
+
+# The columns the app treats as "products" a client can hold.
+PRODUCT_COLS = [
+    'Bank Loans', 'Business Lending', 'Credit Card Balance',
+    'Saving Accounts', 'Checking Accounts', 'Foreign Currency Account'
+]
+
+# 3. DEFINE THE PRE-AGGREGATES
+# The columns the KPI pages filter and group by, and the numbers they add up.
+AGGREGATE_DIMENSIONS = [
+    'Banking Relationship', 'Gender', 'Investment Advisor',
+    'Income Band', 'Engagement Timeframe', 'Nationality'
+]
+AGGREGATE_MEASURES = [
+    'Total Loan', 'Bank Loans', 'Business Lending', 'Credit Card Balance',
+    'Total Deposit', 'Bank Deposits', 'Saving Accounts', 'Checking Accounts',
+    'Foreign Currency Account', 'Amount of Credit Cards', 'Engagment Days', 'Total Fees'
+]
+# Default memory ceiling for the streaming loader, in megabytes.
+STREAM_MEMORY_LIMIT_MB = 256
+# Above this size of the main file, in megabytes, the pages that only need
+# the pre-aggregates (Loan and Deposit Analysis) stream them instead of
+# loading the whole client book into memory.
+FULL_LOAD_LIMIT_MB = 2048
+
+
+def _file_sha256(path, prefix_size=None):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    The file is read in 1 MB blocks so big files don't fill up memory.
+    If prefix_size is given, returns (full_digest, prefix_digest) instead,
+    where prefix_digest only covers the first prefix_size bytes. Both are
+    computed in the same pass over the file.
+    """
+    digest = hashlib.sha256()
+    prefix_digest = None
+    remaining = prefix_size
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            if remaining is not None and remaining <= len(block):
+                digest.update(block[:remaining])
+                prefix_digest = digest.copy().hexdigest()
+                digest.update(block[remaining:])
+                remaining = None
+                continue
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    if prefix_size is None:
+        return digest.hexdigest()
+    return digest.hexdigest(), prefix_digest
+
+
+def source_stamp(data_dir="."):
+    """
+    Returns the (size, modification time) of the 4 raw data files.
+    This is much cheaper than hashing them, so it is what the in-memory
+    cache is keyed on: any change to a file gives a new stamp.
+    """
+    stamp = []
+    for file_name in SOURCE_FILES.values():
+        info = os.stat(os.path.join(data_dir, file_name))
+        stamp.append((file_name, info.st_size, info.st_mtime_ns))
+    return tuple(stamp)
+
+
+def source_fingerprint(data_dir=".", main_prefix_size=None):
+    """
+    Returns a {name: sha256} dictionary for the 4 raw data files.
+    If any file changes, its hash changes, and so does the snapshot key.
+    With main_prefix_size, returns (fingerprint, prefix_sha) where prefix_sha
+    is the hash of the first main_prefix_size bytes of the main file
+    (None if the file is not longer than that).
+    """
+    fingerprint = {}
+    prefix_sha = None
+    for name, file_name in SOURCE_FILES.items():
+        path = os.path.join(data_dir, file_name)
+        if name == "main" and main_prefix_size is not None:
+            fingerprint[name], prefix_sha = _file_sha256(path, main_prefix_size)
+        else:
+            fingerprint[name] = _file_sha256(path)
+    if main_prefix_size is None:
+        return fingerprint
+    return fingerprint, prefix_sha
+
+
+def snapshot_key(fingerprint, as_of=AS_OF_DATE):
+    """
+    Builds the short key a snapshot is stored under.
+    It combines the snapshot version, the content hashes of the source
+    files and the as-of setting ('Engagment Days' is counted up to it).
+    When as_of is unset the date comes from the data itself, which the
+    content hashes already cover.
+    """
+    payload = json.dumps(
+        {
+            "version": SNAPSHOT_VERSION,
+            "sources": fingerprint,
+            "as_of": "latest" if as_of is None else str(as_of),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def parse_dates(values, date_format=JOINED_BANK_FORMAT):
+    """
+    Parses a column of date strings with an explicit format.
+    Each distinct string is parsed only once (a client book has far fewer
+    distinct dates than rows), then the results are spread back to the
+    rows by position. Returns (dates, unparseable) where unparseable is
+    the number of non-empty values that didn't match the format.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=date_format, errors='coerce').to_numpy()
+    # Missing values have code -1: point them at an extra NaT at the end.
+    parsed = np.append(parsed, np.array(['NaT'], dtype=parsed.dtype))
+    dates = parsed[codes]
+    unparseable = int(np.isnat(dates).sum() - (codes == -1).sum())
+    return pd.Series(dates, index=values.index, name=values.name), unparseable
+
+
+def resolve_as_of(dates, as_of=AS_OF_DATE):
+    """
+    Returns the as-of date as a pd.Timestamp: as_of if it is set,
+    otherwise the latest of dates (NaT if there are no dates at all).
+    """
+    if as_of is not None:
+        return pd.Timestamp(as_of)
+    return pd.Timestamp(dates.max())
+
+
+def scan_as_of(data_dir=".", as_of=AS_OF_DATE, chunk_rows=1000000):
+    """
+    Same as resolve_as_of, for when the clean frame is not in memory
+    (the streaming loader). Only the 'Joined Bank' column is read.
+    """
+    if as_of is not None:
+        return pd.Timestamp(as_of)
+    latest = pd.NaT
+    main_path = os.path.join(data_dir, SOURCE_FILES["main"])
+    for df_chunk in pd.read_csv(main_path, usecols=['Joined Bank'], chunksize=chunk_rows):
+        dates, _ = parse_dates(df_chunk['Joined Bank'])
+        chunk_latest = dates.max()
+        if pd.isna(latest) or chunk_latest > latest:
+            latest = chunk_latest
+    return pd.Timestamp(latest)
+
+
+def add_engagement_features(df, as_of=None):
+    """
+    (Re)computes the 2 columns that depend on the as-of date:
+    'Engagment Days' and the 'Engagement Timeframe' bins.
+    as_of defaults to resolve_as_of on df's own 'Joined Bank' dates.
+    They are kept apart from the rest of the cleaning so a snapshot can be
+    moved to a new as-of date without re-reading the CSV files.
+    """
+    if as_of is None:
+        as_of = resolve_as_of(df['Joined Bank'])
+    df['Engagment Days'] = (pd.Timestamp(as_of) - df['Joined Bank']).dt.days
+
+    # We use pd.cut to group the 'Engagment Days' into categories.
+    df['Engagement Timeframe'] = pd.cut(df['Engagment Days'], bins=ENGAGEMENT_BINS, labels=ENGAGEMENT_LABELS, right=False)
+    return df
+
+
+# 4. DERIVED COLUMNS
+# Per-client metrics the pages use, computed once at load time.
+# Each entry is name -> function(df) returning the new column. They run in
+# this order, so a metric can use the ones registered before it.
+# To add a metric, register it here (and bump SNAPSHOT_VERSION); every
+# page can then read it straight from the frame.
+DERIVED_COLUMNS = {}
+
+
+def register_derived_column(name, func):
+    """
+    Adds a derived column to DERIVED_COLUMNS.
+    func takes the clean frame and returns a Series (or array) for it.
+    """
+    DERIVED_COLUMNS[name] = func
+    return func
+
+
+def _has_product(product):
+    return lambda df: df[product] > 0
+
+
+def _product_code(df):
+    # Bit i is set if the client has PRODUCT_COLS[i] (see data_basket.py).
+    code = np.zeros(len(df), dtype=np.uint8)
+    for bit, product in enumerate(PRODUCT_COLS):
+        code |= df[f'Has {product}'].to_numpy(dtype=np.uint8) << bit
+    return code
+
+
+register_derived_column('Total Fees', lambda df: df['Total Loan'] * df['Processing Fees'])
+register_derived_column('Net Position', lambda df: df['Total Deposit'] - df['Total Loan'])
+# A client "has" a product if the value is greater than 0.
+for _product in PRODUCT_COLS:
+    register_derived_column(f'Has {_product}', _has_product(_product))
+register_derived_column(
+    'Product Count',
+    lambda df: df[[f'Has {product}' for product in PRODUCT_COLS]].sum(axis=1).astype('int8'),
+)
+# All 6 'Has' flags packed into one small number, so any have / not-have
+# combination of products is a single comparison.
+register_derived_column('Product Code', _product_code)
+
+
+def add_derived_columns(df):
+    """
+    Adds every column in DERIVED_COLUMNS to df, vectorized, and returns it.
+    """
+    for name, func in DERIVED_COLUMNS.items():
+        df[name] = func(df)
+    return df
+
+
+def merge_and_engineer(df_main, df_gender, df_relationship, df_advisor, as_of=None, date_format=JOINED_BANK_FORMAT):
+    """
+    Merges the 3 "dimension" tables into the main "fact" table, cleans
+    the result and creates all new features.
+    This step has no file access, so it can be reused on any slice of rows.
+    'Joined Bank' is parsed with date_format; the number of values that
+    didn't match it is kept in df.attrs['unparseable_dates'].
+    as_of is the date 'Engagment Days' is counted up to; by default it is
+    resolved from these rows (pass it in when cleaning a slice of a file).
+    """
+
+    # 3. MERGE DATAFRAMES
+    # We merge the 3 small "dimension" tables into the main "fact" table.
+    # We use the correct keys we found during our investigation.
+    df_merged = df_main.merge(df_gender, on='GenderId', how='left')
+    df_merged = df_merged.merge(df_relationship, on='BRId', how='left')
+    df_merged = df_merged.merge(df_advisor, on='IAId', how='left')
+
+    # 4. CLEAN & TRANSFORM (FEATURE ENGINEERING)
+
+    # 4a. Clean Financial Columns
+    # This loop finds any missing values (NaNs) in the financial columns
+    # and replaces them with 0, so we can do math without errors.
+    financial_cols = [
+        'Bank Loans', 'Business Lending', 'Credit Card Balance',
+        'Bank Deposits', 'Saving Accounts', 'Foreign Currency Account', 'Checking Accounts'
+    ]
+    for col in financial_cols:
+        df_merged[col] = pd.to_numeric(df_merged[col], errors='coerce').fillna(0)
+
+    # 4b. Create 'Engagment Days' and 'Engagement Timeframe' (Binning)
+    df_merged['Joined Bank'], unparseable = parse_dates(df_merged['Joined Bank'], date_format)
+    as_of = resolve_as_of(df_merged['Joined Bank'], AS_OF_DATE if as_of is None else as_of)
+    add_engagement_features(df_merged, as_of)
+
+    # 4c. Create 'Income Band' (Binning)
+    # Same logic, but for 'Estimated Income'.
+    df_merged['Estimated Income'] = pd.to_numeric(df_merged['Estimated Income'], errors='coerce').fillna(0)
+    df_merged['Income Band'] = pd.cut(df_merged['Estimated Income'], bins=INCOME_BINS, labels=INCOME_LABELS, right=False)
+
+    # 4d. Create 'Processing Fees' (Mapping)
+    # We use .map() to convert text categories into numbers.
+    fee_map = { "High": 0.05, "Mid": 0.03, "Low": 0.01 }
+    df_merged['Processing Fees'] = df_merged['Fee Structure'].map(fee_map).fillna(0)
+
+    # 4e. Create 'Total Loan'
+    df_merged['Total Loan'] = df_merged['Bank Loans'] + df_merged['Business Lending'] + df_merged['Credit Card Balance']
+
+    # 4f. Create 'Total Deposit'
+    df_merged['Total Deposit'] = df_merged['Bank Deposits'] + df_merged['Saving Accounts'] + \
+                                 df_merged['Foreign Currency Account'] + df_merged['Checking Accounts']
+
+    # 4g. Add the registered derived columns (fees, product flags, ...)
+    add_derived_columns(df_merged)
+
+    # 5. FINALIZE
+    # We drop the old ID columns since we now have the text names (e.g., "Male", "Private Bank").
+    cols_to_drop = ['GenderId', 'BRId', 'IAId']
+    df_final = df_merged.drop(columns=cols_to_drop)
+    df_final.attrs['unparseable_dates'] = unparseable
+    df_final.attrs['as_of'] = as_of.isoformat()
+    return df_final
+
+
+def apply_dtype_plan(df):
+    """
+    Converts df to the compact dtypes defined in CATEGORICAL_COLS and
+    SMALL_INT_COLS and returns it.
+    An integer column is only downcast if it has no missing values; if its
+    values don't fit the planned type, the smallest type that fits is used.
+    """
+    for col in CATEGORICAL_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col, dtype in SMALL_INT_COLS.items():
+        if col not in df.columns or df[col].isna().any():
+            continue
+        limits = np.iinfo(dtype)
+        if df[col].between(limits.min, limits.max).all():
+            df[col] = df[col].astype(dtype)
+        else:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def bytes_per_row(df):
+    """
+    Returns the average memory (in bytes) one row of df takes up,
+    counting the real size of text values (deep=True).
+    """
+    if len(df) == 0:
+        return 0.0
+    return df.memory_usage(index=False, deep=True).sum() / len(df)
+
+
+def memory_report(df_before, df_after):
+    """
+    Compares the memory footprint of a frame before and after
+    apply_dtype_plan. Returns a small DataFrame with one row per column
+    plus a 'Total' row, in bytes per row.
+    apply_dtype_plan changes the frame it is given, so compare against a copy:
+    memory_report(df, apply_dtype_plan(df.copy()))
+    """
+    before = df_before.memory_usage(index=False, deep=True) / max(len(df_before), 1)
+    after = df_after.memory_usage(index=False, deep=True) / max(len(df_after), 1)
+    report = pd.DataFrame({
+        'Dtype Before': df_before.dtypes.astype(str),
+        'Dtype After': df_after.dtypes.astype(str),
+        'Bytes/Row Before': before,
+        'Bytes/Row After': after,
+    })
+    report.loc['Total', ['Bytes/Row Before', 'Bytes/Row After']] = [before.sum(), after.sum()]
+    return report
+
+
+def _read_dimensions(data_dir="."):
+    """
+    Loads the 3 small "dimension" tables (gender, relationship, advisor).
+    """
+    df_gender = pd.read_csv(os.path.join(data_dir, SOURCE_FILES["gender"]))
+    df_relationship = pd.read_csv(os.path.join(data_dir, SOURCE_FILES["relationship"]))
+    df_advisor = pd.read_csv(os.path.join(data_dir, SOURCE_FILES["advisor"]))
+    return df_gender, df_relationship, df_advisor
+
+
+def build_clean_data(data_dir=".", as_of=None):
+    """
+    Loads all 4 raw data files from data_dir, runs them through
+    merge_and_engineer and applies the dtype plan.
+    This is the slow "full rebuild" path.
+    """
+    df_main = pd.read_csv(os.path.join(data_dir, SOURCE_FILES["main"]))
+    df_clean = merge_and_engineer(df_main, *_read_dimensions(data_dir), as_of=as_of)
+    return apply_dtype_plan(df_clean)
+
+
+def iter_clean_chunks(data_dir=".", chunk_rows=100000, as_of=None):
+    """
+    Streaming version of build_clean_data: reads the main file
+    chunk_rows rows at a time and yields each chunk merged, cleaned and
+    feature-engineered. Only one chunk is in memory at a time.
+    The as-of date is worked out for the whole file first (in chunks of
+    the same size), so every chunk counts 'Engagment Days' up to the same
+    date.
+    """
+    if as_of is None:
+        as_of = scan_as_of(data_dir, chunk_rows=chunk_rows)
+    dimensions = _read_dimensions(data_dir)
+    main_path = os.path.join(data_dir, SOURCE_FILES["main"])
+    for df_main in pd.read_csv(main_path, chunksize=chunk_rows):
+        yield apply_dtype_plan(merge_and_engineer(df_main, *dimensions, as_of=as_of))
+
+
+def read_appended_rows(data_dir, offset, as_of):
+    """
+    Reads only the rows that were appended to the main file after the
+    first `offset` bytes, and cleans them exactly like build_clean_data.
+    The column names come from the file's header line.
+    """
+    main_path = os.path.join(data_dir, SOURCE_FILES["main"])
+    columns = pd.read_csv(main_path, nrows=0).columns
+    with open(main_path, "rb") as f:
+        f.seek(offset)
+        try:
+            df_main = pd.read_csv(f, header=None, names=columns)
+        except pd.errors.EmptyDataError:
+            df_main = pd.DataFrame(columns=columns)
+    df_clean = merge_and_engineer(df_main, *_read_dimensions(data_dir), as_of=as_of)
+    return apply_dtype_plan(df_clean)
+
+
+def append_rows(df_old, df_new):
+    """
+    Appends the cleaned new rows to the existing clean frame.
+    Unordered categoricals get any new values merged into their categories
+    first, so the result keeps its compact dtypes instead of falling back
+    to plain text. The categories stay sorted, like astype('category')
+    makes them on a full rebuild, so sorting by the column or picking a
+    reference level gives the same result either way.
+    """
+    if df_new.empty:
+        return df_old
+    df_new = df_new[df_old.columns].copy()
+    for col in df_old.columns:
+        dtype = df_old[col].dtype
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if not dtype.ordered:
+            new_values = pd.Index(df_new[col].dropna().unique().astype(object))
+            extra = new_values.difference(dtype.categories)
+            if len(extra):
+                df_old[col] = df_old[col].cat.set_categories(dtype.categories.union(extra).sort_values())
+        df_new[col] = df_new[col].astype(df_old[col].dtype)
+    return pd.concat([df_old, df_new], ignore_index=True)
+
+
+def read_snapshot_manifest(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the manifest of the latest snapshot as a dictionary,
+    or None if there is no (readable) snapshot from this code version.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("snapshot_version") != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def load_snapshot(manifest, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Loads the snapshot the manifest points to.
+    Returns None if it does not exist or cannot be read, so the caller
+    simply falls back to a full rebuild.
+    """
+    try:
+        # memory_map lets the OS page the columns in straight from disk.
+        return pd.read_parquet(os.path.join(snapshot_dir, manifest["file"]), memory_map=True)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_parquet_atomic(df, path, index=False):
+    """
+    Writes df to a temporary file first and then renames it, so another
+    worker never reads a half-written file.
+    """
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    df.to_parquet(tmp_path, index=index)
+    os.replace(tmp_path, path)
+
+
+def save_snapshot(df, manifest, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Writes df as a Parquet snapshot and points the manifest at it.
+    manifest must hold at least "key"; the file name, row count and
+    snapshot version are filled in here.
+    Snapshots and aggregates that are no longer needed are removed.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    key = manifest["key"]
+    file_name = f"clean-{key}.parquet"
+    _write_parquet_atomic(df, os.path.join(snapshot_dir, file_name))
+
+    manifest = dict(manifest, snapshot_version=SNAPSHOT_VERSION, file=file_name, rows=len(df))
+    tmp_manifest = os.path.join(snapshot_dir, f".{SNAPSHOT_MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_manifest, os.path.join(snapshot_dir, SNAPSHOT_MANIFEST))
+
+    # Aggregates of the previous snapshot are kept one generation longer,
+    # so cached_aggregate can update them with just the appended rows.
+    keep_keys = {key, manifest.get("parent_key")}
+    for old_file in os.listdir(snapshot_dir):
+        if old_file.startswith("clean-"):
+            stale = old_file != file_name
+        elif old_file.startswith("agg-"):
+            stale = old_file.rsplit("-", 1)[-1].split(".")[0] not in keep_keys
+        else:
+            continue
+        if stale:
+            try:
+                os.remove(os.path.join(snapshot_dir, old_file))
+            except OSError:
+                pass
+
+
+def dataset_key(df):
+    """
+    Returns the snapshot key of a frame returned by load_or_build.
+    It changes whenever the data changes, so it is a cheap cache key
+    for anything computed from the frame.
+    """
+    return df.attrs.get("snapshot_key")
+
+
+def cached_per_dataset(build, resource=False, max_entries=2):
+    """
+    Turns build(df, *args) into a loader with the same arguments that runs
+    it once per version of the data and set of args, keyed on
+    dataset_key(df). Only the key and args are hashed, never the frame.
+    - resource=False caches with st.cache_data: every call gets its own
+      copy of the (small) result.
+    - resource=True caches with st.cache_resource: every session shares
+      one copy, for indexes that are big and never modified.
+    A frame without a key (not from load_and_clean_data, e.g. a filtered
+    view) is not cached: build runs on it directly.
+    """
+    cache = st.cache_resource if resource else st.cache_data
+
+    # The leading underscore in "_df" tells Streamlit not to hash it.
+    def cached(key, _df, *args, **kwargs):
+        return build(_df, *args, **kwargs)
+
+    # Streamlit tells cached functions apart by module and name, so every
+    # loader needs its own, or they would all share one cache.
+    cached.__module__ = build.__module__
+    cached.__qualname__ = f"{build.__qualname__}.cached"
+    cached = cache(max_entries=max_entries)(cached)
+
+    @functools.wraps(build)
+    def loader(df, *args, **kwargs):
+        key = dataset_key(df)
+        if key is None:
+            return build(df, *args, **kwargs)
+        return cached(key, df, *args, **kwargs)
+
+    return loader
+
+
+def cached_aggregate(name, df, build, update=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns an aggregate (a DataFrame computed from the full clean frame)
+    that is stored next to the snapshot, so it is only computed once per
+    version of the data.
+    build(df) computes it from scratch. update(previous, df_new), if given,
+    must return the aggregate of the old rows plus df_new: when the latest
+    snapshot only appended rows, that is used instead of build, so the
+    nightly refresh costs O(new rows).
+    """
+    manifest = read_snapshot_manifest(snapshot_dir)
+    if manifest is None or manifest.get("key") != dataset_key(df) or manifest.get("rows") != len(df):
+        # Not the frame the snapshot describes (e.g. a filtered copy).
+        return build(df)
+
+    path = os.path.join(snapshot_dir, f"agg-{name}-{manifest['key']}.parquet")
+    try:
+        return pd.read_parquet(path)
+    except (OSError, ValueError):
+        pass
+
+    aggregate = None
+    parent_key = manifest.get("parent_key")
+    if update is not None and parent_key:
+        try:
+            previous = pd.read_parquet(os.path.join(snapshot_dir, f"agg-{name}-{parent_key}.parquet"))
+            aggregate = update(previous, df.iloc[manifest["appended_from"]:])
+        except (OSError, ValueError, KeyError):
+            aggregate = None
+    if aggregate is None:
+        aggregate = build(df)
+
+    try:
+        _write_parquet_atomic(aggregate, path, index=None)
+    except OSError:
+        pass
+    return aggregate
+
+
+def _ends_with_newline(path, size):
+    """
+    True if the byte just before `size` is a line break, i.e. the old
+    end of the file was a complete row and new rows start right after it.
+    """
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def load_or_build(data_dir=".", snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the clean DataFrame, doing as little work as possible:
+    - source files and as-of setting unchanged: read the snapshot.
+    - only the as-of date changed: read the snapshot and refresh the
+      2 date-based columns.
+    - rows appended to the main file: read the snapshot and clean only
+      the new rows (found by the byte offset stored in the manifest).
+    - anything else: full rebuild.
+    The (new) snapshot is saved on the way out.
+    """
+    main_path = os.path.join(data_dir, SOURCE_FILES["main"])
+    manifest = read_snapshot_manifest(snapshot_dir)
+
+    # While hashing the main file, also remember the hash of the part the
+    # old snapshot was built from: if it still matches, rows were only appended.
+    fingerprint, prefix_sha = source_fingerprint(
+        data_dir, main_prefix_size=manifest["main_size"] if manifest is not None else 0
+    )
+    key = snapshot_key(fingerprint)
+    new_manifest = {
+        "key": key,
+        "sources": fingerprint,
+        "main_size": os.path.getsize(main_path),
+    }
+
+    df = None
+    if manifest is not None:
+        same_dimensions = all(
+            manifest["sources"].get(name) == fingerprint[name]
+            for name in SOURCE_FILES if name != "main"
+        )
+        same_main = manifest["sources"].get("main") == fingerprint["main"]
+        appended = (
+            new_manifest["main_size"] > manifest["main_size"]
+            and prefix_sha is not None
+            and prefix_sha == manifest["sources"].get("main")
+            and _ends_with_newline(main_path, manifest["main_size"])
+        )
+        if same_dimensions and (same_main or appended):
+            df = load_snapshot(manifest, snapshot_dir)
+
+        if df is not None and manifest["key"] == key:
+            df.attrs["snapshot_key"] = key
+            df.attrs["unparseable_dates"] = manifest.get("unparseable_dates", 0)
+            df.attrs["as_of"] = manifest["as_of"]
+            return df
+
+        if df is not None:
+            unparseable = manifest.get("unparseable_dates", 0)
+            if appended:
+                # Clean the new rows up to the old as-of date first; if the
+                # new rows move it, everything is refreshed just below.
+                df_new = read_appended_rows(data_dir, manifest["main_size"], as_of=manifest["as_of"])
+                n_old = len(df)
+                df = append_rows(df, df_new)
+                unparseable = manifest.get("unparseable_dates", 0) + df_new.attrs.get("unparseable_dates", 0)
+            as_of = resolve_as_of(df['Joined Bank'])
+            if as_of == pd.Timestamp(manifest["as_of"]):
+                if appended:
+                    # Old rows are untouched, so aggregates can be updated
+                    # from the new rows alone.
+                    new_manifest.update(parent_key=manifest["key"], appended_from=n_old)
+            else:
+                add_engagement_features(df, as_of)
+
+    if df is None:
+        df = build_clean_data(data_dir)
+        unparseable = df.attrs.get("unparseable_dates", 0)
+        as_of = pd.Timestamp(df.attrs["as_of"])
+
+    # Rows whose 'Joined Bank' didn't match JOINED_BANK_FORMAT are kept
+    # (with no date), but counted so the app can warn about them.
+    new_manifest["unparseable_dates"] = unparseable
+    df.attrs["unparseable_dates"] = unparseable
+    new_manifest["as_of"] = df.attrs["as_of"] = as_of.isoformat()
+    df.attrs["snapshot_key"] = key
+    try:
+        save_snapshot(df, new_manifest, snapshot_dir)
+    except OSError:
+        # A read-only disk should not stop the app, it just means
+        # the next cold start has to rebuild again.
+        pass
+    return df
+
+
+def aggregate_frame(df):
+    """
+    Adds up AGGREGATE_MEASURES (plus a 'Client Count' of rows) for every
+    combination of AGGREGATE_DIMENSIONS that occurs in df.
+    Returns a flat DataFrame with one row per combination. Missing
+    dimension values are kept as their own group, so no row is lost.
+    """
+    grouped = df[AGGREGATE_DIMENSIONS + AGGREGATE_MEASURES].groupby(AGGREGATE_DIMENSIONS, observed=True, dropna=False)
+    df_agg = grouped[AGGREGATE_MEASURES].sum()
+    df_agg['Client Count'] = grouped.size()
+    return _restore_dimension_dtypes(df_agg.reset_index())
+
+
+def combine_aggregates(aggregates):
+    """
+    Merges several results of aggregate_frame (e.g. one per chunk, or the
+    old aggregate plus the one of newly appended rows) into one.
+    Sums are additive, so adding the groups up gives the exact total.
+    """
+    aggregates = [agg for agg in aggregates if not agg.empty]
+    if not aggregates:
+        return pd.DataFrame(columns=AGGREGATE_DIMENSIONS + AGGREGATE_MEASURES + ['Client Count'])
+    # Each chunk can have its own categories, so we group on plain values.
+    df_all = pd.concat(
+        [agg.astype({col: object for col in AGGREGATE_DIMENSIONS}) for agg in aggregates],
+        ignore_index=True,
+    )
+    df_agg = df_all.groupby(AGGREGATE_DIMENSIONS, dropna=False, as_index=False).sum()
+    return _restore_dimension_dtypes(df_agg)
+
+
+def _restore_dimension_dtypes(df_agg):
+    """
+    Turns the dimension columns of an aggregate back into categoricals,
+    keeping the natural order of 'Income Band' and 'Engagement Timeframe'.
+    """
+    ordered = {
+        'Income Band': INCOME_LABELS,
+        'Engagement Timeframe': ENGAGEMENT_LABELS,
+    }
+    for col in AGGREGATE_DIMENSIONS:
+        if col in ordered:
+            df_agg[col] = pd.Categorical(df_agg[col], categories=ordered[col], ordered=True)
+        else:
+            df_agg[col] = df_agg[col].astype('category')
+    return df_agg
+
+
+def rows_per_chunk(data_dir=".", memory_limit_mb=STREAM_MEMORY_LIMIT_MB, sample_rows=1000):
+    """
+    Works out how many rows can be processed per chunk while staying
+    under memory_limit_mb. A small sample is cleaned to measure the real
+    bytes per row; the merge and feature steps hold a few copies of a
+    chunk at once, so we leave room for 4. A limit too small for even
+    one row still gives chunks of 1 row.
+    """
+    main_path = os.path.join(data_dir, SOURCE_FILES["main"])
+    df_sample = pd.read_csv(main_path, nrows=sample_rows)
+    df_clean = merge_and_engineer(df_sample, *_read_dimensions(data_dir))
+    row_bytes = max(bytes_per_row(df_sample) + bytes_per_row(df_clean), 1.0)
+    return max(int(memory_limit_mb * 1024 * 1024 / (4 * row_bytes)), 1)
+
+
+def load_aggregates_streaming(data_dir=".", memory_limit_mb=STREAM_MEMORY_LIMIT_MB, as_of=None):
+    """
+    Builds the aggregate_frame result for the whole main file without
+    ever holding the full client book in memory. Each chunk is cleaned,
+    aggregated and folded into a running total, which only has one row
+    per dimension combination no matter how many clients there are.
+    """
+    chunk_rows = rows_per_chunk(data_dir, memory_limit_mb)
+    df_total = None
+    for df_chunk in iter_clean_chunks(data_dir, chunk_rows, as_of=as_of):
+        df_chunk_agg = aggregate_frame(df_chunk)
+        df_total = df_chunk_agg if df_total is None else combine_aggregates([df_total, df_chunk_agg])
+    if df_total is None:
+        return combine_aggregates([])
+    return df_total
+
+
+# 6. CACHE THE DATA
+# This @st.cache_resource decorator tells Streamlit to run this function
+# only ONCE per version of the data files. After the first run, it keeps
+# the result in memory. This makes the app super fast, as we don't reload
+# and clean the data every time a user clicks a filter.
+# Unlike @st.cache_data, it hands every session the SAME DataFrame instead
+# of a fresh copy per rerun, so pages must never modify it: select rows
+# with filtered_view and put new columns in a separate Series or frame.
+# On top of that, load_or_build keeps a snapshot on disk, so a restart
+# or a new worker process doesn't have to re-parse the CSV files either.
+@st.cache_resource(max_entries=2)
+def _load_version(stamp):
+    """
+    Cached loader. `stamp` is only used as the cache key: when a file
+    changes on disk, the stamp changes and the data is loaded again.
+    """
+    return load_or_build()
+
+
 def load_and_clean_data():
     """
-    This is the main function that loads all 4 raw data files, 
+    This is the main function that loads all 4 raw data files,
     merges them, cleans them, and creates all new features.
-    It returns a single, final DataFrame.
-    """
-    
-    # 2. DEFINE FILE NAMES
-    file_main = "Banking.csv"
-    file_gender = "gender.csv"
-    file_relationship = "banking-realtionships.csv"
-    file_advisor = "investment-advisiors.csv"
-    
-    # 3. LOAD RAW DATA
+    It returns a single, final DataFrame, shared by all sessions
+    (treat it as read-only).
+    """
+
     # A try/except block is used to catch errors if files are missing.
     try:
-        df_main = pd.read_csv(file_main)
-        df_gender = pd.read_csv(file_gender)
-        df_relationship = pd.read_csv(file_relationship)
-        df_advisor = pd.read_csv(file_advisor)
-
-        # 4. MERGE DATAFRAMES
-        # We merge the 3 small "dimension" tables into the main "fact" table.
-        # We use the correct keys we found during our investigation.
-        df_merged = df_main.merge(df_gender, on='GenderId', how='left')
-        df_merged = df_merged.merge(df_relationship, on='BRId', how='left')
-        df_merged = df_merged.merge(df_advisor, on='IAId', how='left')
-
-        # 5. CLEAN & TRANSFORM (FEATURE ENGINEERING)
-        
-        # 5a. Clean Financial Columns
-        # This loop finds any missing values (NaNs) in the financial columns
-        # and replaces them with 0, so we can do math without errors.
-        financial_cols = [
-            'Bank Loans', 'Business Lending', 'Credit Card Balance', 
-            'Bank Deposits', 'Saving Accounts', 'Foreign Currency Account', 'Checking Accounts'
-        ]
-        for col in financial_cols:
-            df_merged[col] = pd.to_numeric(df_merged[col], errors='coerce').fillna(0)
-
-        # 5b. Create 'Engagment Days'
-        df_merged['Joined Bank'] = pd.to_datetime(df_merged['Joined Bank'], errors='coerce')
-        df_merged['Engagment Days'] = (pd.Timestamp.today() - df_merged['Joined Bank']).dt.days
-
-        # 5c. Create 'Engagement Timeframe' (Binning)
-        # We use pd.cut to group the 'Engagment Days' into categories.
-        bins_time = [-float('inf'), 365, 1825, 3650, 7300, float('inf')]
-        labels_time = ["< 1 Years", "< 5 Years", "< 10 Years", "< 20 Years", "> 20 Years"]
-        df_merged['Engagement Timeframe'] = pd.cut(df_merged['Engagment Days'], bins=bins_time, labels=labels_time, right=False)
-
-        # 5d. Create 'Income Band' (Binning)
-        # Same logic, but for 'Estimated Income'.
-        df_merged['Estimated Income'] = pd.to_numeric(df_merged['Estimated Income'], errors='coerce').fillna(0)
-        bins_income = [-float('inf'), 100000, 300000, float('inf')]
-        labels_income = ["Low", "Mid", "High"]
-        df_merged['Income Band'] = pd.cut(df_merged['Estimated Income'], bins=bins_income, labels=labels_income, right=False)
-
-        # 5e. Create 'Processing Fees' (Mapping)
-        # We use .map() to convert text categories into numbers.
-        fee_map = { "High": 0.05, "Mid": 0.03, "Low": 0.01 }
-        df_merged['Processing Fees'] = df_merged['Fee Structure'].map(fee_map).fillna(0)
-
-        # 5f. Create 'Total Loan'
-        df_merged['Total Loan'] = df_merged['Bank Loans'] + df_merged['Business Lending'] + df_merged['Credit Card Balance']
-
-        # 5g. Create 'Total Deposit'
-        df_merged['Total Deposit'] = df_merged['Bank Deposits'] + df_merged['Saving Accounts'] + \
-                                     df_merged['Foreign Currency Account'] + df_merged['Checking Accounts']
-                                     
-        # 6. FINALIZE & RETURN
-        # We drop the old ID columns since we now have the text names (e.g., "Male", "Private Bank").
-        cols_to_drop = ['GenderId', 'BRId', 'IAId']
-        df_final = df_merged.drop(columns=cols_to_drop)
-        
         # This is the final, clean DataFrame that all our app pages will use.
-        return df_final
-    
+        # Timed, so the Diagnostics page shows what loading costs per run.
+        with profile_step("data", "load_and_clean_data") as info:
+            df = _load_version(source_stamp())
+            info['rows'] = len(df)
+        if df.attrs.get("unparseable_dates", 0):
+            st.warning(
+                f"{df.attrs['unparseable_dates']} 'Joined Bank' values didn't match the "
+                f"expected {JOINED_BANK_FORMAT} format and were left empty."
+            )
+        return df
+
     except FileNotFoundError as e:
         # If a file is missing, show an error on the app.
         st.error(f"Error: {e}. One of the 4 data files was not found.")
@@ -92,4 +854,61 @@ def load_and_clean_data():
     except KeyError as e:
         # If a merge key is wrong, show an error.
         st.error(f"KeyError: {e}. A column name for merging is incorrect.")
-        return pd.DataFrame() # Return an empty DataFrame
\ No newline at end of file
+        return pd.DataFrame() # Return an empty DataFrame
+
+
+def filtered_view(df, positions=None, columns=None):
+    """
+    Returns a selection of the shared clean frame without copying all of it:
+    - positions: the row positions to keep (e.g. from np.flatnonzero(mask)
+      or data_index.bitmap_positions). None keeps every row.
+    - columns: the columns to keep. None keeps every column.
+    Only the selected cells are gathered. With no row selection the shared
+    frame (or a column subset of it) comes back, so never modify the
+    result in place.
+    A selection is not the cached dataset, so it loses the dataset key
+    (pandas copies attrs to it): the load_* helpers then compute on the
+    selection instead of returning the whole book's cached results.
+    """
+    if positions is None and columns is None:
+        return df
+    if columns is not None:
+        df = df[list(columns)]
+    if positions is not None:
+        df = df.take(positions)
+    df.attrs.pop("snapshot_key", None)
+    return df
+
+
+@st.cache_data(max_entries=2)
+def _load_aggregates_version(stamp, memory_limit_mb):
+    """
+    Cached streaming aggregation, keyed on the source files' stamp.
+    """
+    return load_aggregates_streaming(memory_limit_mb=memory_limit_mb)
+
+
+def too_large_to_load(data_dir=".", limit_mb=FULL_LOAD_LIMIT_MB):
+    """
+    True when the main file is bigger than limit_mb, so pages should use
+    load_client_aggregates instead of load_and_clean_data.
+    """
+    return os.path.getsize(os.path.join(data_dir, SOURCE_FILES["main"])) > limit_mb * 1024 * 1024
+
+
+def load_client_aggregates(memory_limit_mb=STREAM_MEMORY_LIMIT_MB):
+    """
+    Returns the pre-aggregated sums by AGGREGATE_DIMENSIONS, computed by
+    streaming the main file in chunks that fit in memory_limit_mb.
+    Use this instead of load_and_clean_data when the client book is too
+    big to load in one piece.
+    """
+    try:
+        return _load_aggregates_version(source_stamp(), memory_limit_mb)
+
+    except FileNotFoundError as e:
+        st.error(f"Error: {e}. One of the 4 data files was not found.")
+        return pd.DataFrame()
+    except KeyError as e:
+        st.error(f"KeyError: {e}. A column name for merging is incorrect.")
+        return pd.DataFrame()
@@ -0,0 +1,470 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from data_index import filter_rows
+from data_processing import cached_aggregate, cached_per_dataset
+
+# 1. SUFFICIENT STATISTICS
+# A straight-line regression of y on x only needs 6 numbers from the data:
+# n, the sums of x and y, and the sums of x*y, x^2 and y^2. They are cheap
+# to add up in one vectorized pass over all clients, and once cached every
+# statistic below is a few arithmetic steps, however big the book is.
+SUM_NAMES = ['n', 'sum_x', 'sum_y', 'sum_xy', 'sum_xx', 'sum_yy']
+
+# The numeric columns the statistics pages work with (the Correlation
+# page offers all of them; the Regression and Comparative pages a subset).
+# Their sums are precomputed for every pair at once, see section 4.
+MOMENT_COLUMNS = [
+    'Estimated Income', 'Total Deposit', 'Total Loan', 'Age', 'Engagment Days',
+    'Superannuation Savings', 'Properties Owned', 'Amount of Credit Cards',
+    'Credit Card Balance', 'Bank Loans', 'Bank Deposits', 'Checking Accounts',
+    'Saving Accounts'
+]
+MOMENT_NAMES = ['n', 'sum', 'sum_sq', 'cross']
+# The moment matrices are added up this many rows at a time, so the
+# temporary arrays stay small however big the book is.
+MOMENT_CHUNK_ROWS = 500000
+
+
+def pair_sums(df, x, y):
+    """
+    Adds up the sufficient statistics of the x/y pair over the rows where
+    both are present. Returns a {name: value} dictionary (see SUM_NAMES).
+    """
+    xs = df[x].to_numpy(dtype=float)
+    ys = df[y].to_numpy(dtype=float)
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    if not valid.all():
+        xs, ys = xs[valid], ys[valid]
+    return {
+        'n': int(len(xs)),
+        'sum_x': float(xs.sum()),
+        'sum_y': float(ys.sum()),
+        'sum_xy': float(xs @ ys),
+        'sum_xx': float(xs @ xs),
+        'sum_yy': float(ys @ ys),
+    }
+
+
+def combine_sums(parts):
+    """
+    Adds up pair_sums results of separate row sets (e.g. chunks, or old
+    and newly appended rows), giving the sums of all of them together.
+    """
+    return {name: sum(part[name] for part in parts) for name in SUM_NAMES}
+
+
+# 2. REGRESSION FROM THE SUMS
+def regression_from_sums(sums):
+    """
+    Simple linear regression of y on x from pair_sums.
+    Returns the same 5 values as scipy.stats.linregress, as a dictionary:
+    slope, intercept, r_value, p_value and std_err. Needs at least 3 rows
+    and some spread in x; otherwise every value is NaN.
+    """
+    n = sums['n']
+    nan = {'slope': np.nan, 'intercept': np.nan, 'r_value': np.nan, 'p_value': np.nan, 'std_err': np.nan}
+    if n < 3:
+        return nan
+    mean_x = sums['sum_x'] / n
+    mean_y = sums['sum_y'] / n
+    # Sums of squares around the means.
+    ss_xx = sums['sum_xx'] - n * mean_x * mean_x
+    ss_yy = sums['sum_yy'] - n * mean_y * mean_y
+    ss_xy = sums['sum_xy'] - n * mean_x * mean_y
+    if ss_xx <= 0:
+        return nan
+
+    slope = ss_xy / ss_xx
+    intercept = mean_y - slope * mean_x
+    r_value = ss_xy / np.sqrt(ss_xx * ss_yy) if ss_yy > 0 else 0.0
+    r_value = float(np.clip(r_value, -1.0, 1.0))
+
+    # Same t-test on the slope as linregress, with n - 2 degrees of freedom.
+    dof = n - 2
+    one_minus_r2 = (1.0 - r_value) * (1.0 + r_value)
+    if one_minus_r2 <= 0:
+        p_value, std_err = 0.0, 0.0
+    else:
+        t_stat = r_value * np.sqrt(dof / one_minus_r2)
+        p_value = float(2 * stats.t.sf(abs(t_stat), dof))
+        std_err = float(np.sqrt(one_minus_r2 * ss_yy / ss_xx / dof))
+    return {
+        'slope': float(slope), 'intercept': float(intercept), 'r_value': r_value,
+        'p_value': p_value, 'std_err': std_err,
+    }
+
+
+# 3. CACHE THE SUMS
+def filtered_pair_sums(df, x, y, filters=None):
+    """
+    pair_sums for the x/y pair over the rows matching filters, an optional
+    {column: value} dictionary applied through the bitmap index (see
+    data_index.select).
+    """
+    df = filter_rows(df, filters) if filters else df
+    return pair_sums(df, x, y)
+
+
+# Computed once per version of the data and filter state.
+load_pair_sums = cached_per_dataset(filtered_pair_sums, max_entries=256)
+
+
+def load_regression(df, x, y, filters=None):
+    """
+    Regression of y on x over all (filtered) clients, from the cached sums.
+    Without filters the sums come straight from the moment matrices.
+    Returns regression_from_sums' dictionary plus 'n', the rows used.
+    """
+    if not filters and x in MOMENT_COLUMNS and y in MOMENT_COLUMNS:
+        sums = pair_sums_from_moments(load_moments(df), x, y)
+    else:
+        sums = load_pair_sums(df, x, y, filters)
+    return {**regression_from_sums(sums), 'n': sums['n']}
+
+
+# 4. ALL-PAIRS MOMENT MATRICES
+# The same sums as pair_sums, for every pair of MOMENT_COLUMNS at once.
+# For columns i and j, over the rows where both are present:
+#   n[i, j]      = number of rows
+#   sum[i, j]    = sum of column i
+#   sum_sq[i, j] = sum of column i squared
+#   cross[i, j]  = sum of column i times column j
+# With missing values set to 0 and a 0/1 "present" matrix V, each one is
+# a single matrix product, e.g. n = V.T @ V and cross = X.T @ X.
+def build_moments(df, columns=MOMENT_COLUMNS):
+    """
+    Computes the moment matrices of columns over all rows of df.
+    Returns a DataFrame indexed by (moment, column) with one column per
+    entry of columns, so it can be stored next to the snapshot.
+    """
+    k = len(columns)
+    totals = {name: np.zeros((k, k)) for name in MOMENT_NAMES}
+    for start in range(0, len(df), MOMENT_CHUNK_ROWS):
+        values = df[columns].iloc[start:start + MOMENT_CHUNK_ROWS].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        present = present.astype(float)
+        totals['n'] += present.T @ present
+        totals['sum'] += values.T @ present
+        totals['sum_sq'] += (values * values).T @ present
+        totals['cross'] += values.T @ values
+    index = pd.MultiIndex.from_product([MOMENT_NAMES, columns], names=['moment', 'column'])
+    return pd.DataFrame(np.vstack([totals[name] for name in MOMENT_NAMES]), index=index, columns=columns)
+
+
+def _update_moments(previous, df_new):
+    """
+    Adds the moments of newly appended rows to existing moment matrices.
+    """
+    return previous + build_moments(df_new, list(previous.columns))
+
+
+def stored_moments(df):
+    """
+    Returns the moment matrices of MOMENT_COLUMNS for the clean frame df.
+    They are stored next to the snapshot, so they are built once per
+    version of the data; when rows are only appended, just the new rows
+    are added in.
+    """
+    return cached_aggregate('moments', df, build_moments, _update_moments)
+
+
+load_moments = cached_per_dataset(stored_moments)
+
+
+def pair_sums_from_moments(moments, x, y):
+    """
+    Reads the pair_sums of the x/y pair out of the moment matrices.
+    """
+    return {
+        'n': int(moments.loc[('n', x), y]),
+        'sum_x': moments.loc[('sum', x), y],
+        'sum_y': moments.loc[('sum', y), x],
+        'sum_xy': moments.loc[('cross', x), y],
+        'sum_xx': moments.loc[('sum_sq', x), y],
+        'sum_yy': moments.loc[('sum_sq', y), x],
+    }
+
+
+def correlation_from_moments(moments, columns):
+    """
+    The Pearson correlation matrix of columns (a subset of the moment
+    columns), using for each pair the rows where both are present, like
+    DataFrame.corr(). Only slices the k x k moment matrices.
+    """
+    n = moments.loc['n'].loc[columns, columns].to_numpy()
+    sums = moments.loc['sum'].loc[columns, columns].to_numpy()
+    sums_sq = moments.loc['sum_sq'].loc[columns, columns].to_numpy()
+    cross = moments.loc['cross'].loc[columns, columns].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # sums[i, j] is the sum of i and sums.T[i, j] the sum of j, over the same rows.
+        ss_cross = cross - sums * sums.T / n
+        ss_i = sums_sq - sums * sums / n
+        ss_j = ss_i.T
+        corr = ss_cross / np.sqrt(ss_i * ss_j)
+    corr = np.clip(corr, -1.0, 1.0)
+    # A column against itself is exactly 1 (if it varies at all).
+    diagonal = np.diag(ss_i) > 0
+    corr[np.diag_indices(len(columns))] = np.where(diagonal, 1.0, np.nan)
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def load_correlation(df, columns):
+    """
+    Correlation matrix of columns for the clean frame df, served from the
+    cached moment matrices (any column outside them falls back to df.corr).
+    """
+    if all(col in MOMENT_COLUMNS for col in columns):
+        return correlation_from_moments(load_moments(df), list(columns))
+    return df[columns].corr()
+
+
+# 5. MULTIPLE REGRESSION FROM A CACHED GRAM MATRIX
+# Least squares only needs the Gram matrix Z'Z of the design columns Z:
+# an intercept, every MOMENT_COLUMNS column and a 0/1 column for every level
+# of REGRESSION_CATEGORICALS. Any model (any Y, any set of predictors) is a
+# slice of that one matrix, so adding or removing a predictor re-solves a
+# small system instead of going over the rows again.
+# A model should only lose the rows missing one of its own columns, so
+# there is one Gram matrix per "missing pattern" (the set of columns a row
+# is missing). A model adds up the ones that miss none of its columns.
+# Real data only has a handful of patterns, most rows being complete.
+REGRESSION_CATEGORICALS = [
+    'Gender', 'Nationality', 'Fee Structure', 'Loyalty Classification',
+    'Banking Relationship', 'Investment Advisor', 'Income Band'
+]
+INTERCEPT = 'Intercept'
+# The pattern name separates the missing columns with this.
+MISSING_SEPARATOR = '|'
+# One-hot rows are wider than the moment rows, so use smaller chunks.
+GRAM_CHUNK_ROWS = 100000
+# Relative size below which a direction of the (scaled) Gram matrix counts
+# as zero, i.e. predictors that are exact combinations of others.
+GRAM_RCOND = 1e-10
+
+
+def dummy_name(column, level):
+    """
+    The name of the 0/1 design column of one level of a categorical.
+    """
+    return f"{column}: {level}"
+
+
+def build_gram(df, columns=MOMENT_COLUMNS, categoricals=REGRESSION_CATEGORICALS):
+    """
+    Computes the Gram matrix of the design columns over the rows of df,
+    once per missing pattern. Returns a DataFrame indexed by (missing,
+    design column) with one column per design column: 'missing' names the
+    columns the rows of that block lack, joined by MISSING_SEPARATOR ('' for
+    complete rows). Missing values count as 0 in their block, which is
+    never used by a model with that column. The intercept entry on a
+    block's diagonal is its number of rows.
+    """
+    variables = list(columns) + list(categoricals)
+    levels = {col: list(df[col].cat.categories) for col in categoricals}
+    names = [INTERCEPT] + list(columns) + [
+        dummy_name(col, level) for col in categoricals for level in levels[col]
+    ]
+    grams = {}
+    for start in range(0, len(df), GRAM_CHUNK_ROWS):
+        df_chunk = df.iloc[start:start + GRAM_CHUNK_ROWS]
+        values = df_chunk[columns].to_numpy(dtype=float)
+        codes = [df_chunk[col].cat.codes.to_numpy() for col in categoricals]
+        missing = np.column_stack([np.isnan(values)] + [code < 0 for code in codes])
+        values = np.where(np.isnan(values), 0.0, values)
+        blocks = [np.ones((len(values), 1)), values]
+        for col, code in zip(categoricals, codes):
+            one_hot = np.zeros((len(values), len(levels[col])))
+            present = code >= 0
+            one_hot[np.flatnonzero(present), code[present]] = 1.0
+            blocks.append(one_hot)
+        design = np.hstack(blocks)
+        # Each row's pattern as one number, bit i set if it lacks variables[i].
+        row_patterns = missing.astype(np.int64) @ (np.int64(1) << np.arange(len(variables), dtype=np.int64))
+        patterns = np.unique(row_patterns)
+        for pattern in patterns:
+            name = MISSING_SEPARATOR.join(var for bit, var in enumerate(variables) if pattern >> bit & 1)
+            # Usually every row is complete, and then no rows need picking out.
+            rows = design if len(patterns) == 1 else design[row_patterns == pattern]
+            grams[name] = grams.get(name, 0.0) + rows.T @ rows
+    if not grams:
+        grams[''] = np.zeros((len(names), len(names)))
+    return pd.concat(
+        {name: pd.DataFrame(gram, index=names, columns=names) for name, gram in grams.items()},
+        names=['missing', 'term']
+    )
+
+
+def _update_gram(previous, df_new):
+    """
+    Adds the Gram matrices of newly appended rows to existing ones.
+    A categorical level first seen in the new rows gets a new row and
+    column, which is 0 for all the old rows; so does a new missing pattern.
+    The levels follow df_new's categories, which append_rows keeps sorted,
+    so the result has the same order as build_gram on all the rows.
+    """
+    numeric = [name for name in previous.columns if name in MOMENT_COLUMNS]
+    categoricals = [col for col in REGRESSION_CATEGORICALS if col in df_new.columns]
+    gram_new = build_gram(df_new, numeric, categoricals)
+    names = list(gram_new.columns) + [name for name in previous.columns if name not in gram_new.columns]
+    total = previous.add(gram_new, fill_value=0)
+    patterns = total.index.get_level_values('missing').unique()
+    index = pd.MultiIndex.from_product([patterns, names], names=['missing', 'term'])
+    return total.reindex(index=index, columns=names, fill_value=0.0)
+
+
+def gram_for(grams, variables):
+    """
+    The Gram matrix over the rows that have every one of variables
+    (column names): the sum of the missing-pattern blocks of build_gram
+    that lack none of them.
+    """
+    variables = set(variables)
+    used = [
+        pattern for pattern in grams.index.get_level_values('missing').unique()
+        if not variables & set(filter(None, pattern.split(MISSING_SEPARATOR)))
+    ]
+    names = grams.columns
+    gram = pd.DataFrame(0.0, index=names, columns=names)
+    for pattern in used:
+        gram += grams.loc[pattern].loc[names, names]
+    return gram
+
+
+def stored_gram(df):
+    """
+    Returns build_gram's Gram matrices for the clean frame df. Like the
+    moment matrices, they are stored next to the snapshot and updated with
+    just the appended rows.
+    """
+    return cached_aggregate('gram-by-missing', df, build_gram, _update_gram)
+
+
+load_gram = cached_per_dataset(stored_gram)
+
+
+def fit_from_gram(grams, y, predictors, categoricals=()):
+    """
+    Ordinary least squares of y on the numeric predictors plus one-hot
+    categoricals, with an intercept, over the rows that have all of them
+    (grams is build_gram's result). Each categorical's first level (that
+    has any rows) is the reference level and gets no column of its own.
+    Returns (coefficients, summary):
+    - coefficients: a DataFrame indexed by design column with the
+      Coefficient, Std. Error, t, P-value and Standardized (the change in y,
+      in standard deviations, per standard deviation of the predictor).
+    - summary: a dictionary with n, r_squared, adj_r_squared and rank (if
+      rank is below the number of coefficients, some predictors are exact
+      combinations of others and their coefficients are not unique).
+    """
+    gram = gram_for(grams, [y] + list(predictors) + list(categoricals))
+    n = gram.loc[INTERCEPT, INTERCEPT]
+    names = [INTERCEPT] + list(predictors)
+    for col in categoricals:
+        prefix = dummy_name(col, '')
+        present = [name for name in gram.index if name.startswith(prefix) and gram.loc[name, name] > 0]
+        names += present[1:]
+
+    xtx = gram.loc[names, names].to_numpy()
+    xty = gram.loc[names, y].to_numpy()
+    yty = gram.loc[y, y]
+    sum_y = gram.loc[INTERCEPT, y]
+
+    # Scale every column to length 1 first, so Income (in the 100,000s)
+    # and a 0/1 dummy are on the same footing when solving.
+    scale = np.sqrt(np.diag(xtx))
+    scale[scale == 0] = 1.0
+    xtx_scaled = xtx / np.outer(scale, scale)
+    inverse = np.linalg.pinv(xtx_scaled, rcond=GRAM_RCOND, hermitian=True) / np.outer(scale, scale)
+    rank = int(np.linalg.matrix_rank(xtx_scaled, tol=GRAM_RCOND * np.linalg.norm(xtx_scaled, 2), hermitian=True))
+    beta = inverse @ xty
+
+    # Residual and total sums of squares, still from the sums alone.
+    rss = max(yty - beta @ xty, 0.0)
+    tss = yty - sum_y * sum_y / n
+    dof = n - rank
+    r_squared = 1.0 - rss / tss if tss > 0 else np.nan
+    adj_r_squared = 1.0 - (1.0 - r_squared) * (n - 1) / dof if dof > 0 else np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma2 = rss / dof if dof > 0 else np.nan
+        std_err = np.sqrt(np.maximum(np.diag(inverse), 0.0) * sigma2)
+        t_stat = beta / std_err
+        p_value = 2 * stats.t.sf(np.abs(t_stat), dof) if dof > 0 else np.full(len(names), np.nan)
+        # Standard deviations of each design column and of y.
+        sums = gram.loc[INTERCEPT, names].to_numpy()
+        sd_x = np.sqrt(np.maximum(np.diag(xtx) - sums * sums / n, 0.0) / (n - 1))
+        sd_y = np.sqrt(tss / (n - 1))
+        standardized = beta * sd_x / sd_y
+    standardized[0] = np.nan
+
+    coefficients = pd.DataFrame({
+        'Coefficient': beta, 'Std. Error': std_err, 't': t_stat,
+        'P-value': p_value, 'Standardized': standardized,
+    }, index=pd.Index(names, name='Term'))
+    summary = {'n': int(n), 'r_squared': r_squared, 'adj_r_squared': adj_r_squared, 'rank': rank}
+    return coefficients, summary
+
+
+def load_multiple_regression(df, y, predictors, categoricals=()):
+    """
+    fit_from_gram on the cached Gram matrix of the clean frame df.
+    """
+    return fit_from_gram(load_gram(df), y, predictors, categoricals)
+
+
+# 6. GROUPED MOMENTS FOR T-TESTS AND ANOVA
+# A Welch t-test and a one-way ANOVA only need the count, mean and variance
+# of every group. One groupby pass gives them for all groups at once,
+# instead of one scan of the whole frame per group.
+def group_moments(df, cat_var, num_var):
+    """
+    Count, mean and variance (ddof=1) of num_var for every group of
+    cat_var, ignoring missing values. Groups are in order of first
+    appearance, like df[cat_var].unique(); groups with no values are
+    left out.
+    """
+    moments = df.groupby(cat_var, observed=True, sort=False)[num_var].agg(['count', 'mean', 'var'])
+    return moments[moments['count'] > 0]
+
+
+def welch_from_moments(moments):
+    """
+    Welch's t-test between the first 2 groups of group_moments.
+    Returns (t statistic, p-value), the same as
+    scipy.stats.ttest_ind(group1, group2, equal_var=False).
+    """
+    (n1, mean1, var1), (n2, mean2, var2) = moments[['count', 'mean', 'var']].to_numpy()[:2]
+    se1, se2 = var1 / n1, var2 / n2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat = (mean1 - mean2) / np.sqrt(se1 + se2)
+        # Welch-Satterthwaite degrees of freedom.
+        dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    p_value = 2 * stats.t.sf(abs(t_stat), dof)
+    return float(t_stat), float(p_value)
+
+
+def anova_from_moments(moments):
+    """
+    One-way ANOVA across all groups of group_moments.
+    Returns (F statistic, p-value), the same as
+    scipy.stats.f_oneway(*groups).
+    """
+    counts = moments['count'].to_numpy(dtype=float)
+    means = moments['mean'].to_numpy()
+    # A group of 1 has no variance of its own (NaN); it adds 0 within.
+    variances = moments['var'].fillna(0.0).to_numpy()
+    n, k = counts.sum(), len(counts)
+    grand_mean = (counts * means).sum() / n
+    ss_between = (counts * (means - grand_mean) ** 2).sum()
+    ss_within = ((counts - 1) * variances).sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_stat = (ss_between / (k - 1)) / (ss_within / (n - k))
+    p_value = stats.f.sf(f_stat, k - 1, n - k)
+    return float(f_stat), float(p_value)
+
+
+# Computed once per version of the data and pair of columns.
+load_group_moments = cached_per_dataset(group_moments, max_entries=256)
@@ -0,0 +1,118 @@
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from data_processing import JOINED_BANK_FORMAT, SOURCE_FILES
+
+# 1. DEFINE THE GENERATOR SETTINGS
+# The synthetic client book is "grown" from the real Banking.csv: every
+# new row starts as a copy of a random real row (so the columns keep their
+# real mix and the way they relate to each other), then gets its own
+# Client ID, name, join date and slightly shifted money amounts.
+MONEY_COLS = [
+    'Estimated Income', 'Superannuation Savings', 'Credit Card Balance',
+    'Bank Loans', 'Bank Deposits', 'Checking Accounts', 'Saving Accounts',
+    'Foreign Currency Account', 'Business Lending'
+]
+# Money amounts are multiplied by a random factor around 1 (log-normal),
+# so no two synthetic clients are exact copies of each other.
+MONEY_JITTER = 0.1
+# About 2% of the real rows share a Client ID with another row; the
+# synthetic book keeps roughly the same share of repeat clients.
+DUPLICATE_ID_SHARE = 0.02
+# How many rows are made and written at a time.
+DEFAULT_CHUNK_ROWS = 500000
+
+
+def read_seed_book(data_dir="."):
+    """
+    Loads the real main file the synthetic rows are copied from.
+    Everything is read as text except the money columns, so the copied
+    rows are written back exactly as they came in.
+    """
+    main_path = os.path.join(data_dir, SOURCE_FILES["main"])
+    df_seed = pd.read_csv(main_path, dtype=str, encoding="utf-8-sig")
+    for col in MONEY_COLS:
+        df_seed[col] = pd.to_numeric(df_seed[col], errors='coerce')
+    return df_seed
+
+
+def generate_chunk(df_seed, n_rows, first_id, rng):
+    """
+    Makes n_rows synthetic client rows shaped like df_seed.
+    Client IDs count up from first_id, except for the share of repeat
+    clients, which reuse an ID from earlier in the same chunk.
+    """
+    # 2. COPY RANDOM REAL ROWS
+    picks = rng.integers(0, len(df_seed), n_rows)
+    df_chunk = df_seed.iloc[picks].reset_index(drop=True)
+
+    # 3. NEW IDENTITIES
+    ids = np.arange(first_id, first_id + n_rows)
+    repeats = np.flatnonzero(rng.random(n_rows) < DUPLICATE_ID_SHARE)
+    repeats = repeats[repeats > 0]
+    ids[repeats] = ids[rng.integers(0, repeats)]
+    df_chunk['Client ID'] = pd.Series(ids).map('IND{:08d}'.format)
+
+    names = df_seed['Name'].str.split(' ', n=1, expand=True)
+    first_names = names[0].dropna().unique()
+    last_names = names[1].dropna().unique()
+    df_chunk['Name'] = (
+        pd.Series(first_names[rng.integers(0, len(first_names), n_rows)])
+        + ' '
+        + pd.Series(last_names[rng.integers(0, len(last_names), n_rows)])
+    )
+
+    # 4. NEW JOIN DATES, SPREAD OVER THE SAME YEARS AS THE REAL BOOK
+    seed_dates = pd.to_datetime(df_seed['Joined Bank'], format=JOINED_BANK_FORMAT, errors='coerce')
+    span_days = max((seed_dates.max() - seed_dates.min()).days, 1)
+    joined = seed_dates.min() + pd.to_timedelta(rng.integers(0, span_days + 1, n_rows), unit='D')
+    df_chunk['Joined Bank'] = joined.strftime(JOINED_BANK_FORMAT)
+
+    # 5. SHIFT THE MONEY AMOUNTS A LITTLE
+    for col in MONEY_COLS:
+        df_chunk[col] = (df_chunk[col] * rng.lognormal(0.0, MONEY_JITTER, n_rows)).round(2)
+    return df_chunk
+
+
+def write_client_book(out_dir, n_rows, data_dir=".", seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Writes a synthetic Banking.csv with n_rows rows to out_dir, plus
+    copies of the 3 dimension files, so out_dir can be used anywhere a
+    data folder is expected (e.g. load_or_build(out_dir)).
+    The rows are made and written chunk_rows at a time, so even 10M rows
+    only need one chunk in memory. The same seed gives the same file.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for name, file_name in SOURCE_FILES.items():
+        if name != "main":
+            shutil.copyfile(os.path.join(data_dir, file_name), os.path.join(out_dir, file_name))
+
+    df_seed = read_seed_book(data_dir)
+    rng = np.random.default_rng(seed)
+    main_path = os.path.join(out_dir, SOURCE_FILES["main"])
+    tmp_path = main_path + ".tmp"
+    written = 0
+    with open(tmp_path, "w", encoding="utf-8-sig", newline="") as f:
+        while written < n_rows:
+            size = min(chunk_rows, n_rows - written)
+            df_chunk = generate_chunk(df_seed, size, written + 1, rng)
+            df_chunk.to_csv(f, index=False, header=(written == 0), float_format='%.2f')
+            written += size
+    # Only replace the old file once the new one is complete.
+    os.replace(tmp_path, main_path)
+    return main_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic client book shaped like Banking.csv.")
+    parser.add_argument("rows", type=int, help="number of client rows, e.g. 1000000")
+    parser.add_argument("out_dir", help="folder to write the 4 CSV files to")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=".", help="folder with the real data files")
+    args = parser.parse_args()
+    path = write_client_book(args.out_dir, args.rows, data_dir=args.data_dir, seed=args.seed)
+    print(f"Wrote {args.rows:,} rows to {path}")
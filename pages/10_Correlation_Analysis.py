@@ -4,12 +4,16 @@ import plotly.express as px
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from data_stats import MOMENT_COLUMNS, load_correlation
+from profiling import start_page, lap
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Correlation Analysis", page_icon="🔗", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Correlation Analysis")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 if not df.empty:
     st.title("Correlation Analysis")
@@ -17,21 +21,8 @@ if not df.empty:
 
     # 4. DEFINE NUMERICAL COLUMNS
     # These are the columns a user can select for the analysis
-    numerical_cols = [
-        'Estimated Income', 
-        'Total Deposit', 
-        'Total Loan', 
-        'Age', 
-        'Engagment Days', 
-        'Superannuation Savings', 
-        'Properties Owned',
-        'Amount of Credit Cards',
-        'Credit Card Balance',
-        'Bank Loans', 
-        'Bank Deposits',
-        'Checking Accounts',
-        'Saving Accounts'
-    ]
+    # (see data_stats.MOMENT_COLUMNS for the full list)
+    numerical_cols = MOMENT_COLUMNS
     
     # 5. USER SELECTION
     st.subheader("Select Variables for Correlation")
@@ -50,12 +41,11 @@ if not df.empty:
     else:
         # 6. PERFORM STATISTICAL MODELING
         
-        # Select only the columns the user has chosen
-        df_selected = df[selected_cols]
-        
-        # Calculate the correlation matrix
-        # .corr() is the pandas function that runs the statistical model
-        corr_matrix = df_selected.corr()
+        # Calculate the correlation matrix of the chosen columns
+        # The full matrix is worked out once per version of the data from
+        # cached sums (see data_stats.py); here we only take our slice of it
+        corr_matrix = load_correlation(df, selected_cols)
+        lap(timer, "compute: corr", rows=len(df))
         
         # 7. DISPLAY HEATMAP
         st.subheader("Correlation Heatmap")
@@ -74,6 +64,7 @@ if not df.empty:
             zmax=1   # to +1
         )
         st.plotly_chart(fig_heatmap, use_container_width=True)
+        lap(timer, "plot: heatmap")
 
         # 8. DISPLAY CORRELATION TABLE
         st.subheader("Correlation Matrix (Table)")
@@ -81,6 +72,7 @@ if not df.empty:
             corr_matrix.style.background_gradient(cmap='RdBu_r', vmin=-1, vmax=1).format("{:.2f}"),
             use_container_width=True
         )
+        lap(timer, "table: corr")
         
         st.markdown("""
         **How to Read This:**
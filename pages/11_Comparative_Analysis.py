@@ -1,16 +1,19 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from scipy import stats # Import for statistical tests
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from charts import box_chart
+from data_stats import anova_from_moments, load_group_moments, welch_from_moments
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Comparative Analysis", page_icon="📊", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Comparative Analysis")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 if not df.empty:
     st.title("Comparative Analysis (T-tests & ANOVA)")
@@ -59,12 +62,13 @@ if not df.empty:
     # 6. VISUALIZE THE DIFFERENCE
     st.subheader(f"Visual Distribution of {num_var} by {cat_var}")
     
-    # A box plot is the best way to visualize this
-    fig_box = px.box(
-        df.dropna(subset=[cat_var, num_var]), # Drop NaNs for plotting
+    # A box plot is the best way to visualize this.
+    # box_chart works out the quartiles on the server (NaNs are dropped
+    # there), so the browser gets a few numbers per group, not every client.
+    fig_box = box_chart(
+        df,
         x=cat_var,
         y=num_var,
-        color=cat_var,
         title=f"{num_var} Distribution by {cat_var}"
     )
     # If we have too many categories (like Occupation), hide the x-axis labels
@@ -72,30 +76,26 @@ if not df.empty:
         fig_box.update_xaxes(showticklabels=False)
         
     st.plotly_chart(fig_box, use_container_width=True)
+    lap(timer, "plot: box")
     
     # 7. PERFORM STATISTICAL MODELING
     
-    # Get all unique groups from the selected category
-    groups = df[cat_var].dropna().unique()
-    
-    # Create a list of data arrays, one for each group
-    group_data = []
-    for group in groups:
-        group_data.append(df[df[cat_var] == group][num_var].dropna())
+    # Get the count, mean and variance of every group in one pass
+    # (one row per group, cached per pair of variables). The tests below
+    # only need these numbers, not the clients themselves.
+    moments = load_group_moments(df, cat_var, num_var)
+    lap(timer, "compute: groups", rows=len(df))
 
     # --- Run the correct test based on the number of groups ---
     
     st.subheader("Statistical Model Results")
     stat_col1, stat_col2, stat_col3 = st.columns(3)
     
-    if len(group_data) == 2:
+    if len(moments) == 2:
         # --- T-Test (2 groups) ---
-        # Unpack the two groups of data
-        data1 = group_data[0]
-        data2 = group_data[1]
-        
-        # Run the independent T-test
-        t_stat, p_value = stats.ttest_ind(data1, data2, equal_var=False) # 'equal_var=False' is safer
+        # Run the independent T-test on the two groups
+        # (Welch's version, which does not assume equal variances, is safer)
+        t_stat, p_value = welch_from_moments(moments)
         
         with stat_col1:
             st.metric("Test Performed", "T-test")
@@ -104,10 +104,9 @@ if not df.empty:
         with stat_col3:
             st.metric("P-value", f"{p_value:,.4f}")
 
-    elif len(group_data) > 2:
+    elif len(moments) > 2:
         # --- ANOVA (3+ groups) ---
-        # The '*' unpacks the list of data arrays for the function
-        f_stat, p_value = stats.f_oneway(*group_data)
+        f_stat, p_value = anova_from_moments(moments)
         
         with stat_col1:
             st.metric("Test Performed", "ANOVA")
@@ -119,6 +118,7 @@ if not df.empty:
     else:
         st.warning(f"The selected variable '{cat_var}' has less than 2 groups. Cannot perform a test.")
         p_value = 1.0 # Set p-value to 1 to show 'not significant'
+    lap(timer, "compute: test")
 
     # 8. DISPLAY INTERPRETATION
     st.subheader("Interpretation")
@@ -4,12 +4,23 @@ import plotly.express as px
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from tables import paginated_table
+from data_basket import (
+    cross_sell_count,
+    cross_sell_positions,
+    load_basket_counts,
+    load_cross_sell_counts,
+    product_penetration,
+)
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Product Analysis", page_icon="🎁", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Product Analysis")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 # 4. DEFINE PRODUCT COLUMNS
 # These are the columns we'll analyze as "products"
@@ -31,12 +42,16 @@ if not df.empty:
     st.markdown("What percentage of all clients have each product?")
 
     # Calculate penetration
+    # A client "has" a product if the value is greater than 0. The number
+    # of clients holding each of the 64 possible product combinations is
+    # counted once per version of the data (see data_basket.py), and every
+    # product's count follows from those 64 numbers.
     total_clients = len(df)
+    penetration = product_penetration(load_basket_counts(df)['clients'].to_numpy())
     penetration_data = []
 
     for col in product_cols:
-        # A client "has" a product if the value is greater than 0
-        clients_with_product = df[df[col] > 0].shape[0]
+        clients_with_product = int(penetration[col])
         percentage = (clients_with_product / total_clients)
         penetration_data.append({
             'Product': col.replace('_', ' '), # Clean up name
@@ -47,6 +62,8 @@ if not df.empty:
     # Create a DataFrame from our calculated data
     df_penetration = pd.DataFrame(penetration_data).sort_values(by='Percentage', ascending=False)
 
+    lap(timer, "compute: pen", rows=total_clients)
+
     # Create the Bar Chart
     fig_pen = px.bar(
         df_penetration,
@@ -57,6 +74,7 @@ if not df.empty:
     )
     fig_pen.update_layout(yaxis_tickformat=".0%")
     st.plotly_chart(fig_pen, use_container_width=True)
+    lap(timer, "plot: pen")
 
     st.markdown("---")
 
@@ -84,23 +102,18 @@ if not df.empty:
         )
 
     # 8. FILTERING LOGIC
-    # Start with all clients
-    df_filtered = df.copy()
-
-    # Apply the "HAVE" filter
-    if have_products:
-        for product in have_products:
-            df_filtered = df_filtered[df_filtered[product] > 0]
-
-    # Apply the "NOT HAVE" filter
-    if not_have_products:
-        for product in not_have_products:
-            df_filtered = df_filtered[df_filtered[product] == 0]
+    # Every client's products are stored as one 6-bit 'Product Code', so
+    # "has all of these and none of those" is a single comparison per
+    # client. The count for every have / not-have combination is
+    # precomputed, so the metric needs no pass over the clients at all.
+    target_count = cross_sell_count(load_cross_sell_counts(df), have_products, not_have_products)
+    positions = cross_sell_positions(df, have_products, not_have_products)
+    lap(timer, "filter: cross-sell", rows=len(positions))
 
     # 9. DISPLAY RESULTS
     st.metric(
         label="Target Clients Found",
-        value=f"{df_filtered.shape[0]:,} clients"
+        value=f"{target_count:,} clients"
     )
 
     # Define which columns to show in the final table
@@ -119,7 +132,10 @@ if not df.empty:
     # Remove duplicates if any
     display_cols = list(dict.fromkeys(display_cols)) 
 
-    st.dataframe(df_filtered[display_cols], use_container_width=True)
+    # Only one page of the clients is sent to the browser at a time;
+    # search and sort run on the server (see tables.py)
+    paginated_table(df, display_cols, positions, key="cross_sell")
+    lap(timer, "table: cross-sell", rows=len(positions))
 
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
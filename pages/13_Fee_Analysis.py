@@ -4,12 +4,16 @@ import plotly.express as px
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from charts import box_chart
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Fee & Profitability", page_icon="💰", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Fee & Profitability")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 # 4. SAFETY CHECK
 if not df.empty:
@@ -23,12 +27,11 @@ if not df.empty:
         # 6. Chart 1: Total Fees by Structure (Bar)
         st.subheader("Total Fees Generated by Fee Structure")
         
-        # We need to calculate Total Fees first
-        df['Total Fees'] = df['Total Loan'] * df['Processing Fees']
-        
         # Group by 'Fee Structure' and sum the 'Total Fees'
-        df_fees = df.groupby('Fee Structure')['Total Fees'].sum().reset_index()
+        # ('Total Fees' is precomputed for every client when the data is loaded)
+        df_fees = df.groupby('Fee Structure', observed=True)['Total Fees'].sum().reset_index()
         
+        lap(timer, "compute: fees_bar")
         fig_fees_bar = px.bar(
             df_fees,
             x='Fee Structure',
@@ -37,20 +40,22 @@ if not df.empty:
             title='Total Fees Generated'
         )
         st.plotly_chart(fig_fees_bar, use_container_width=True)
+        lap(timer, "plot: fees_bar")
 
         # 7. Chart 2: Loyalty vs. Fee Structure (Stacked Bar)
         st.subheader("Loyalty Mix by Fee Structure")
         
         # --- Manual Percentage Calculation ---
         # 1. Get Raw Grouped Counts
-        df_loyalty_raw = df.groupby(['Fee Structure', 'Loyalty Classification'])['Client ID'].count().reset_index(name='Client Count')
+        df_loyalty_raw = df.groupby(['Fee Structure', 'Loyalty Classification'], observed=True)['Client ID'].count().reset_index(name='Client Count')
         # 2. Get Group Totals
-        df_totals = df_loyalty_raw.groupby('Fee Structure')['Client Count'].sum().reset_index(name='Total Clients')
+        df_totals = df_loyalty_raw.groupby('Fee Structure', observed=True)['Client Count'].sum().reset_index(name='Total Clients')
         # 3. Merge Totals Back
         df_loyalty = df_loyalty_raw.merge(df_totals, on='Fee Structure')
         # 4. Calculate Percentage
         df_loyalty['Percentage'] = df_loyalty['Client Count'] / df_loyalty['Total Clients']
         
+        lap(timer, "compute: loyalty_stack")
         fig_loyalty_stack = px.bar(
             df_loyalty,
             x='Fee Structure',
@@ -61,28 +66,31 @@ if not df.empty:
         )
         fig_loyalty_stack.update_layout(yaxis_tickformat=".0%")
         st.plotly_chart(fig_loyalty_stack, use_container_width=True)
+        lap(timer, "plot: loyalty_stack")
 
     with col2:
         # 8. Chart 3: Income vs. Fee Structure (Box Plot)
         st.subheader("Income Distribution by Fee Structure")
         
         # A box plot is perfect for comparing distributions
-        fig_income_box = px.box(
+        # (computed on the server, see charts.box_chart)
+        fig_income_box = box_chart(
             df,
             x='Fee Structure',
             y='Estimated Income',
-            color='Fee Structure',
             title='Estimated Income by Fee Structure'
         )
         # We limit the y-axis to make it readable (excluding extreme outliers)
         fig_income_box.update_layout(yaxis_range=[0, 800000])
         st.plotly_chart(fig_income_box, use_container_width=True)
+        lap(timer, "plot: income_box")
         
         # 9. Chart 4: Clients per Fee Structure (Pie)
         st.subheader("Client Distribution by Fee Structure")
         df_pie = df['Fee Structure'].value_counts().reset_index()
         df_pie.columns = ['Fee Structure', 'Client Count']
         
+        lap(timer, "compute: pie")
         fig_pie = px.pie(
             df_pie,
             names='Fee Structure',
@@ -90,6 +98,7 @@ if not df.empty:
             title='Percentage of Clients in Each Fee Structure'
         )
         st.plotly_chart(fig_pie, use_container_width=True)
+        lap(timer, "plot: pie")
 
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
@@ -1,16 +1,18 @@
 import streamlit as st
 import pandas as pd
-import numpy as np # Import numpy
-from mlxtend.frequent_patterns import apriori, association_rules
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from data_basket import SEGMENT_COLS, filter_rules, load_rule_table, load_segment_rule_table
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Product Affinity", page_icon="🛒", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Product Affinity")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 # 4. DEFINE PRODUCT COLUMNS
 product_cols = [
@@ -28,12 +30,14 @@ if not df.empty:
     st.markdown("Discover which products are most frequently held together by clients.")
 
     # 6. DATA BINARIZATION
-    df_basket = pd.DataFrame()
-    for col in product_cols:
-        df_basket[col] = (df[col] > 0).astype(bool) 
+    # The True/False "has product" columns are precomputed at load time,
+    # we just name them after the products again (for the first 5 clients).
+    df_basket = df.head()[[f'Has {col}' for col in product_cols]]
+    df_basket.columns = product_cols
 
     st.subheader("Client Product Holdings (Sample)")
-    st.dataframe(df_basket.head(), use_container_width=True)
+    st.dataframe(df_basket, use_container_width=True)
+    lap(timer, "table: basket sample")
     st.markdown("---")
     
     # 7. USER-CONTROLLED THRESHOLD
@@ -46,24 +50,13 @@ if not df.empty:
 
     # 8. RUN DATA MINING MODELS
     try:
-        frequent_itemsets = apriori(
-            df_basket, 
-            min_support=min_support_slider, 
-            use_colnames=True
-        )
-
-        # --- NEW CODE: Suppress the RuntimeWarning ---
-        # We wrap the calculation in 'np.errstate' to
-        # temporarily ignore 'invalid divide' warnings.
-        with np.errstate(divide='ignore', invalid='ignore'):
-            rules = association_rules(
-                frequent_itemsets, 
-                metric="lift", 
-                min_threshold=1.0 
-            )
-        # --- End of new code ---
-            
-        rules = rules.sort_values(by='confidence', ascending=False)
+        # Every client's products are packed into one 6-bit number and the
+        # 64 possible baskets are counted once per version of the data.
+        # Every rule (with its support, confidence and lift) follows from
+        # those counts, so the slider only picks the frequent ones:
+        # the same result as apriori + association_rules(metric="lift").
+        rules = filter_rules(load_rule_table(df), min_support=min_support_slider, min_lift=1.0)
+        lap(timer, "compute: rules", rows=len(df))
         
         st.markdown("---")
         st.subheader("Top Association Rules")
@@ -86,6 +79,7 @@ if not df.empty:
                 }),
                 use_container_width=True
             )
+            lap(timer, "table: rules", rows=len(rules_display))
 
             st.markdown("""
             **How to Read This Table:**
@@ -100,5 +94,54 @@ if not df.empty:
         st.error(f"An error occurred during mining. This can happen if the support threshold is too low for the data.")
         st.exception(e)
 
+    # 10. RULES BY SEGMENT
+    # The rules of every advisor, relationship, loyalty tier, income band
+    # and nationality are mined once per version of the data (see
+    # data_basket.py), so here we only filter and rank them.
+    st.markdown("---")
+    st.subheader("Association Rules by Segment")
+    st.markdown("Support, confidence and lift are measured within each segment's own clients.")
+
+    segment_rules = load_segment_rule_table(df)
+    lap(timer, "compute: segment rules", rows=len(segment_rules))
+
+    seg_col1, seg_col2, seg_col3 = st.columns(3)
+    with seg_col1:
+        segment = st.selectbox("Segment by:", options=SEGMENT_COLS)
+    with seg_col2:
+        values = segment_rules.loc[segment_rules['segment'] == segment, 'value'].unique()
+        value = st.selectbox("Segment:", options=['All'] + sorted(values))
+    with seg_col3:
+        rank_by = st.selectbox("Rank rules by:", options=['lift', 'confidence', 'support'])
+
+    # Uses the same support threshold as the slider above.
+    df_segment_rules = segment_rules[segment_rules['segment'] == segment]
+    if value != 'All':
+        df_segment_rules = df_segment_rules[df_segment_rules['value'] == value]
+    df_segment_rules = filter_rules(df_segment_rules, min_support=min_support_slider, min_lift=1.0)
+    df_segment_rules = df_segment_rules.sort_values(rank_by, ascending=False)
+
+    if df_segment_rules.empty:
+        st.warning("No association rules found for this segment with the current settings.")
+    else:
+        segment_display = df_segment_rules[
+            ['value', 'clients', 'antecedents', 'consequents', 'support', 'confidence', 'lift']
+        ].head(500).rename(columns={'value': segment})
+        segment_display['antecedents'] = segment_display['antecedents'].apply(', '.join)
+        segment_display['consequents'] = segment_display['consequents'].apply(', '.join)
+        st.dataframe(
+            segment_display.style
+            .format({
+                'clients': '{:,}',
+                'support': '{:.2%}',
+                'confidence': '{:.2%}',
+                'lift': '{:.2f}'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.caption(f"Showing the top {len(segment_display):,} of {len(df_segment_rules):,} rules.")
+        lap(timer, "table: segment rules", rows=len(segment_display))
+
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
@@ -0,0 +1,74 @@
+import os
+
+import streamlit as st
+import plotly.express as px
+
+# 1. IMPORT THE PROFILER
+from profiling import (
+    clear_records,
+    dump_records,
+    memory_tracking,
+    records_frame,
+    set_memory_tracking,
+    summary_frame,
+)
+
+# 2. SET PAGE CONFIGURATION
+st.set_page_config(page_title="Diagnostics", page_icon="🩺", layout="wide")
+
+# 3. KEEP THE PAGE HIDDEN
+# The page only shows anything when opened as .../Diagnostics?diagnostics=1
+# or when the server runs with BANKING_DIAGNOSTICS=1, so normal users of
+# the dashboard never see it.
+enabled = st.query_params.get("diagnostics") == "1" or os.environ.get("BANKING_DIAGNOSTICS") == "1"
+if not enabled:
+    st.info("Nothing to see here.")
+    st.stop()
+
+st.title("Diagnostics")
+st.markdown(
+    "Time spent per page and step by this server process, newest runs included. "
+    "Every page records its load, compute, plot and table steps as it runs."
+)
+
+# 4. CONTROLS
+col1, col2, col3 = st.columns(3)
+with col1:
+    track_memory = st.toggle(
+        "Count allocated bytes (slows the app down)",
+        value=memory_tracking()
+    )
+    if track_memory != memory_tracking():
+        set_memory_tracking(track_memory)
+with col2:
+    if st.button("Save records to a CSV file"):
+        st.success(f"Saved to {dump_records()}")
+with col3:
+    if st.button("Clear records"):
+        clear_records()
+
+df_records = records_frame()
+if df_records.empty:
+    st.warning("No steps recorded yet. Open a few pages of the dashboard first.")
+    st.stop()
+
+# 5. SLOWEST STEPS
+st.subheader("Steps by Total Time")
+df_summary = summary_frame(df_records)
+st.dataframe(
+    df_summary.style.format({
+        'mean_s': '{:.4f}', 'p95_s': '{:.4f}', 'max_s': '{:.4f}', 'total_s': '{:.3f}',
+        'rows': '{:,.0f}', 'mean_bytes': '{:,.0f}'
+    }),
+    use_container_width=True
+)
+
+# 6. TIME PER PAGE RUN
+st.subheader("Average Time per Page Run, by Step")
+df_pages = df_summary.assign(mean_ms=df_summary['mean_s'] * 1000)
+fig_pages = px.bar(df_pages, x='page', y='mean_ms', color='step', title='Mean milliseconds per step')
+st.plotly_chart(fig_pages, use_container_width=True)
+
+# 7. RAW RECORDS
+with st.expander("All records"):
+    st.dataframe(df_records.iloc[::-1], use_container_width=True)
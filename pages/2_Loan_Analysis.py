@@ -2,18 +2,23 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
-# 1. IMPORT OUR CLEANING FUNCTION
+# 1. IMPORT OUR DATA FUNCTIONS
 # We are in a subfolder (pages), so we import from the parent folder.
-from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from data_cube import load_page_cube, slice_cube, cube_totals, cube_rollup
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Loan Analysis", page_icon="💰", layout="wide")
 
 # 3. LOAD THE DATA
-df = load_and_clean_data()
+timer = start_page("Loan Analysis")
+# This page only needs the cube, so a client book too large to load is
+# streamed into it instead (see data_cube.load_page_cube).
+cube = load_page_cube()
+lap(timer, "load", rows=int(cube['Client Count'].sum()) if not cube.empty else 0)
 
 # 4. SAFETY CHECK
-if not df.empty:
+if not cube.empty:
     st.title("Loan Analysis")
 
     # 5. DEFINE FILTERS
@@ -21,36 +26,37 @@ if not df.empty:
     filter_col1, filter_col2, filter_col3 = st.columns(3)
     with filter_col1:
         # Get a list of unique values from the column for the options
-        relationship_options = ['All'] + list(df['Banking Relationship'].dropna().unique())
+        relationship_options = ['All'] + list(cube['Banking Relationship'].dropna().unique())
         selected_relationship = st.selectbox("Banking Relationship", options=relationship_options, index=0)
     with filter_col2:
-        gender_options = ['All'] + list(df['Gender'].dropna().unique())
+        gender_options = ['All'] + list(cube['Gender'].dropna().unique())
         selected_gender = st.selectbox("Gender", options=gender_options, index=0)
     with filter_col3:
-        advisor_options = ['All'] + list(df['Investment Advisor'].dropna().unique())
+        advisor_options = ['All'] + list(cube['Investment Advisor'].dropna().unique())
         selected_advisor = st.selectbox("Investment Advisor", options=advisor_options, index=0)
 
-    # 6. FILTER DATAFRAME
-    # Same logic as 1_Home.py, but for our 3 new filters.
-    df_filtered = df.copy()
-    if selected_relationship != 'All':
-        df_filtered = df_filtered[df_filtered['Banking Relationship'] == selected_relationship]
-    if selected_gender != 'All':
-        df_filtered = df_filtered[df_filtered['Gender'] == selected_gender]
-    if selected_advisor != 'All':
-        df_filtered = df_filtered[df_filtered['Investment Advisor'] == selected_advisor]
+    # 6. FILTER THE CUBE
+    # Instead of filtering every client row, we filter the pre-added-up
+    # "cube" (one row per group of clients) and add up what is left.
+    df_cube = slice_cube(cube, {
+        'Banking Relationship': selected_relationship,
+        'Gender': selected_gender,
+        'Investment Advisor': selected_advisor,
+    })
+    totals = cube_totals(df_cube)
+    lap(timer, "filter", rows=int(totals['Client Count']))
     
     # 7. DISPLAY KPIs
     # These KPIs are specific to the Loan Analysis page.
     kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
     with kpi_col1:
-        st.metric(label="Total Loan", value=f"${df_filtered['Total Loan'].sum():,.2f}")
+        st.metric(label="Total Loan", value=f"${totals['Total Loan']:,.2f}")
     with kpi_col2:
-        st.metric(label="Bank Loan", value=f"${df_filtered['Bank Loans'].sum():,.2f}")
+        st.metric(label="Bank Loan", value=f"${totals['Bank Loans']:,.2f}")
     with kpi_col3:
-        st.metric(label="Business Lending", value=f"${df_filtered['Business Lending'].sum():,.2f}")
+        st.metric(label="Business Lending", value=f"${totals['Business Lending']:,.2f}")
     with kpi_col4:
-        st.metric(label="Credit Cards Balance", value=f"${df_filtered['Credit Card Balance'].sum():,.2f}")
+        st.metric(label="Credit Cards Balance", value=f"${totals['Credit Card Balance']:,.2f}")
         
     st.markdown("---")
 
@@ -60,28 +66,35 @@ if not df.empty:
     with chart_col1:
         # 8a. Chart 1 (Bar)
         st.subheader("Bank Loan by Banking Relationship")
-        # We must group the data before plotting.
-        df_bar = df_filtered.groupby('Banking Relationship')['Bank Loans'].sum().reset_index()
+        # We must group the data before plotting (here: roll up the cube).
+        df_bar = cube_rollup(df_cube, 'Banking Relationship', 'Bank Loans')
+        lap(timer, "compute: bar")
         fig_bar = px.bar(df_bar, x='Banking Relationship', y='Bank Loans', text=df_bar['Bank Loans'].apply(lambda x: f'${x:,.0f}'))
         st.plotly_chart(fig_bar, use_container_width=True)
+        lap(timer, "plot: bar")
 
         # 8b. Chart 2 (Donut)
         st.subheader("Bank Loan by Income Band")
-        df_donut = df_filtered.groupby('Income Band')['Bank Loans'].sum().reset_index()
+        df_donut = cube_rollup(df_cube, 'Income Band', 'Bank Loans')
+        lap(timer, "compute: donut")
         fig_donut = px.pie(df_donut, names='Income Band', values='Bank Loans', hole=0.5)
         st.plotly_chart(fig_donut, use_container_width=True)
+        lap(timer, "plot: donut")
     
     with chart_col2:
         # 8c. Chart 3 (Treemap)
         st.subheader("Bank Loan by Nationality")
-        df_tree = df_filtered.groupby('Nationality')['Bank Loans'].sum().reset_index()
+        df_tree = cube_rollup(df_cube, 'Nationality', 'Bank Loans')
+        lap(timer, "compute: tree")
         fig_tree = px.treemap(df_tree, path=['Nationality'], values='Bank Loans')
         st.plotly_chart(fig_tree, use_container_width=True)
+        lap(timer, "plot: tree")
 
         # 8d. Chart 4 (Bar)
         st.subheader("Total Loan by Engagement Timeframe")
-        df_bar_eng = df_filtered.groupby('Engagement Timeframe')['Total Loan'].sum().reset_index()
+        df_bar_eng = cube_rollup(df_cube, 'Engagement Timeframe', 'Total Loan')
         # st.bar_chart is a simple, built-in chart.
         st.bar_chart(df_bar_eng.set_index('Engagement Timeframe'))
+        lap(timer, "plot: engagement bar")
 else:
     st.warning("Data could not be loaded.")
\ No newline at end of file
@@ -2,56 +2,62 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
-# 1. IMPORT OUR CLEANING FUNCTION
-from data_processing import load_and_clean_data
+# 1. IMPORT OUR DATA FUNCTIONS
+from profiling import start_page, lap
+from data_cube import load_page_cube, slice_cube, cube_totals, cube_rollup
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Deposit Analysis", page_icon="💵", layout="wide")
 
 # 3. LOAD THE DATA
-df = load_and_clean_data()
+timer = start_page("Deposit Analysis")
+# This page only needs the cube, so a client book too large to load is
+# streamed into it instead (see data_cube.load_page_cube).
+cube = load_page_cube()
+lap(timer, "load", rows=int(cube['Client Count'].sum()) if not cube.empty else 0)
 
 # 4. SAFETY CHECK
-if not df.empty:
+if not cube.empty:
     st.title("Deposit Analysis")
 
     # 5. DEFINE FILTERS
     # Same 3 filters as the Loan Analysis page.
     filter_col1, filter_col2, filter_col3 = st.columns(3)
     with filter_col1:
-        relationship_options = ['All'] + list(df['Banking Relationship'].dropna().unique())
+        relationship_options = ['All'] + list(cube['Banking Relationship'].dropna().unique())
         selected_relationship = st.selectbox("Banking Relationship", options=relationship_options, index=0)
     with filter_col2:
-        gender_options = ['All'] + list(df['Gender'].dropna().unique())
+        gender_options = ['All'] + list(cube['Gender'].dropna().unique())
         selected_gender = st.selectbox("Gender", options=gender_options, index=0)
     with filter_col3:
-        advisor_options = ['All'] + list(df['Investment Advisor'].dropna().unique())
+        advisor_options = ['All'] + list(cube['Investment Advisor'].dropna().unique())
         selected_advisor = st.selectbox("Investment Advisor", options=advisor_options, index=0)
 
-    # 6. FILTER DATAFRAME
-    df_filtered = df.copy()
-    if selected_relationship != 'All':
-        df_filtered = df_filtered[df_filtered['Banking Relationship'] == selected_relationship]
-    if selected_gender != 'All':
-        df_filtered = df_filtered[df_filtered['Gender'] == selected_gender]
-    if selected_advisor != 'All':
-        df_filtered = df_filtered[df_filtered['Investment Advisor'] == selected_advisor]
+    # 6. FILTER THE CUBE
+    # Same cube lookup as the Loan Analysis page.
+    df_cube = slice_cube(cube, {
+        'Banking Relationship': selected_relationship,
+        'Gender': selected_gender,
+        'Investment Advisor': selected_advisor,
+    })
+    totals = cube_totals(df_cube)
+    lap(timer, "filter", rows=int(totals['Client Count']))
 
     # 7. DISPLAY KPIs
     # KPIs specific to deposits.
     kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
     with kpi_col1:
-        st.metric(label="Total Deposit", value=f"${df_filtered['Total Deposit'].sum():,.2f}")
+        st.metric(label="Total Deposit", value=f"${totals['Total Deposit']:,.2f}")
     with kpi_col2:
-        st.metric(label="Bank Deposit", value=f"${df_filtered['Bank Deposits'].sum():,.2f}")
+        st.metric(label="Bank Deposit", value=f"${totals['Bank Deposits']:,.2f}")
     with kpi_col3:
-        st.metric(label="Foreign Currency Amount", value=f"${df_filtered['Foreign Currency Account'].sum():,.2f}")
+        st.metric(label="Foreign Currency Amount", value=f"${totals['Foreign Currency Account']:,.2f}")
     
     kpi_col4, kpi_col5 = st.columns(2)
     with kpi_col4:
-        st.metric(label="Saving Account Amount", value=f"${df_filtered['Saving Accounts'].sum():,.2f}")
+        st.metric(label="Saving Account Amount", value=f"${totals['Saving Accounts']:,.2f}")
     with kpi_col5:
-        st.metric(label="Checking Account Amount", value=f"${df_filtered['Checking Accounts'].sum():,.2f}")
+        st.metric(label="Checking Account Amount", value=f"${totals['Checking Accounts']:,.2f}")
         
     st.markdown("---")
 
@@ -60,23 +66,28 @@ if not df.empty:
     with chart_col1:
         # 8a. Chart 1 (Treemap)
         st.subheader("Bank Deposit by Income Band")
-        df_tree = df_filtered.groupby('Income Band')['Bank Deposits'].sum().reset_index()
+        df_tree = cube_rollup(df_cube, 'Income Band', 'Bank Deposits')
+        lap(timer, "compute: tree")
         fig_tree = px.treemap(df_tree, path=['Income Band'], values='Bank Deposits')
         st.plotly_chart(fig_tree, use_container_width=True)
+        lap(timer, "plot: tree")
 
         # 8b. Chart 2 (Bar)
         st.subheader("Total Deposit by Engagement Timeframe")
-        df_bar_eng = df_filtered.groupby('Engagement Timeframe')['Total Deposit'].sum().reset_index()
+        df_bar_eng = cube_rollup(df_cube, 'Engagement Timeframe', 'Total Deposit')
         st.bar_chart(df_bar_eng.set_index('Engagement Timeframe'))
+        lap(timer, "plot: engagement bar")
     
     with chart_col2:
         # 8c. Chart 3 (Stacked Bar)
         st.subheader("Deposit Analysis by Nationality")
         # Group by Nationality and sum the main deposit types
-        df_nat_stack = df_filtered.groupby('Nationality')[['Bank Deposits', 'Saving Accounts', 'Checking Accounts', 'Foreign Currency Account']].sum().reset_index()
+        df_nat_stack = cube_rollup(df_cube, 'Nationality', ['Bank Deposits', 'Saving Accounts', 'Checking Accounts', 'Foreign Currency Account'])
         # We must "melt" the data to a long format for Plotly to stack it.
         df_nat_melted = df_nat_stack.melt(id_vars='Nationality', var_name='Account Type', value_name='Amount')
+        lap(timer, "compute: nat_stack")
         fig_nat_stack = px.bar(df_nat_melted, x='Nationality', y='Amount', color='Account Type', title='Deposit Breakdown by Nationality')
         st.plotly_chart(fig_nat_stack, use_container_width=True)
+        lap(timer, "plot: nat_stack")
 else:
     st.warning("Data could not be loaded.")
\ No newline at end of file
@@ -3,13 +3,18 @@ import pandas as pd
 import plotly.express as px
 
 # 1. IMPORT OUR CLEANING FUNCTION
-from data_processing import load_and_clean_data
+from data_processing import load_and_clean_data, filtered_view
+from profiling import start_page, lap
+from data_cube import load_kpi_cube, slice_cube, cube_totals, frame_totals, distinct_client_count
+from data_index import client_positions, client_suggestions
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Summary", page_icon="📊", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Summary")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 # 4. SAFETY CHECK
 if not df.empty:
@@ -19,14 +24,29 @@ if not df.empty:
     # This is the new, primary filter for this page.
     st.subheader("Client Drill-Down")
     
-    # We create a list of all client names, plus "All Clients" at the start.
-    client_list = ["All Clients"] + sorted(df['Name'].unique())
-    
+    # Type the start of a client's name or Client ID to find them.
+    # The matches come from indexes built once per version of the data
+    # (see data_index.py), so only a short list of suggestions is sent
+    # to the browser, however many clients the bank has.
+    search_text = st.text_input("Search for a client by name or Client ID:")
+    df_suggestions = client_suggestions(df, search_text)
+
+    # Each suggestion shows the Client ID next to the name, so clients
+    # with the same name can be told apart.
+    client_ids = {
+        f"{name} ({client_id})": client_id
+        for client_id, name in zip(df_suggestions['Client ID'], df_suggestions['Name'])
+    }
+    client_list = ["All Clients"] + list(client_ids)
+    if search_text.strip() and not client_ids:
+        st.warning(f"No client's name or Client ID starts with '{search_text.strip()}'.")
+
     selected_client = st.selectbox(
         "Select a Client to Drill Down (or 'All Clients' for default view):",
         options=client_list,
-        index=0 # Default to "All Clients"
+        index=1 if client_ids else 0 # Default to the best match, if any
     )
+    lap(timer, "client search", rows=len(client_ids))
 
     st.markdown("---")
 
@@ -62,21 +82,25 @@ if not df.empty:
             disabled=disable_filters
         )
 
-    # 7. FILTER DATAFRAME (with new logic)
-    df_filtered = df.copy()
-
+    # 7. FILTER DATA (with new logic)
     # If a specific client is selected, we *only* use that filter.
     if selected_client != "All Clients":
-        df_filtered = df_filtered[df_filtered['Name'] == selected_client]
+        # Look the client's rows up by Client ID in the hash index
+        df_filtered = filtered_view(df, client_positions(df, client_ids[selected_client]))
         st.info(f"Showing dashboard for: **{selected_client}**")
+        totals = frame_totals(df_filtered)
+        total_clients = df_filtered['Client ID'].nunique()
     else:
-        # Otherwise, we use the standard 3 filters.
-        if selected_relationship != 'All':
-            df_filtered = df_filtered[df_filtered['Banking Relationship'] == selected_relationship]
-        if selected_gender != 'All':
-            df_filtered = df_filtered[df_filtered['Gender'] == selected_gender]
-        if selected_advisor != 'All':
-            df_filtered = df_filtered[df_filtered['Investment Advisor'] == selected_advisor]
+        # Otherwise, we use the standard 3 filters on the pre-added-up cube.
+        filters = {
+            'Banking Relationship': selected_relationship,
+            'Gender': selected_gender,
+            'Investment Advisor': selected_advisor,
+        }
+        cube, distinct = load_kpi_cube(df)
+        totals = cube_totals(slice_cube(cube, filters))
+        total_clients = distinct_client_count(distinct, filters)
+    lap(timer, "filter", rows=int(totals['Client Count']))
 
     # 8. DISPLAY ALL KPIs
     # This code is the same, but it shows data for EITHER one client OR a group.
@@ -84,20 +108,21 @@ if not df.empty:
     col1, col2, col3, col4 = st.columns(4)
     # ... (st.metric code for all 12 KPIs) ...
     with col1:
-        st.metric(label="Total Clients", value=f"{df_filtered['Client ID'].nunique()}")
-        st.metric(label="Total Deposit", value=f"${df_filtered['Total Deposit'].sum():,.2f}")
-        st.metric(label="Total CC Amount", value=f"${df_filtered['Amount of Credit Cards'].sum():,.2f}")
+        st.metric(label="Total Clients", value=f"{total_clients}")
+        st.metric(label="Total Deposit", value=f"${totals['Total Deposit']:,.2f}")
+        st.metric(label="Total CC Amount", value=f"${totals['Amount of Credit Cards']:,.2f}")
     with col2:
-        st.metric(label="Total Loan", value=f"${df_filtered['Total Loan'].sum():,.2f}")
-        st.metric(label="Total Fees", value=f"${(df_filtered['Total Loan'] * df_filtered['Processing Fees']).sum():,.2f}")
-        st.metric(label="Saving Account Amount", value=f"${df_filtered['Saving Accounts'].sum():,.2f}")
+        st.metric(label="Total Loan", value=f"${totals['Total Loan']:,.2f}")
+        st.metric(label="Total Fees", value=f"${totals['Total Fees']:,.2f}")
+        st.metric(label="Saving Account Amount", value=f"${totals['Saving Accounts']:,.2f}")
     with col3:
-        st.metric(label="Bank Loan", value=f"${df_filtered['Bank Loans'].sum():,.2f}")
-        st.metric(label="Bank Deposit", value=f"${df_filtered['Bank Deposits'].sum():,.2f}")
-        st.metric(label="Foreign Currency Amount", value=f"${df_filtered['Foreign Currency Account'].sum():,.2f}")
+        st.metric(label="Bank Loan", value=f"${totals['Bank Loans']:,.2f}")
+        st.metric(label="Bank Deposit", value=f"${totals['Bank Deposits']:,.2f}")
+        st.metric(label="Foreign Currency Amount", value=f"${totals['Foreign Currency Account']:,.2f}")
     with col4:
-        st.metric(label="Business Lending", value=f"${df_filtered['Business Lending'].sum():,.2f}")
-        st.metric(label="Checking Account Amount", value=f"${df_filtered['Checking Accounts'].sum():,.2f}")
-        st.metric(label="Engagement Days (Total)", value=f"{df_filtered['Engagment Days'].sum():,.0f}")
+        st.metric(label="Business Lending", value=f"${totals['Business Lending']:,.2f}")
+        st.metric(label="Checking Account Amount", value=f"${totals['Checking Accounts']:,.2f}")
+        st.metric(label="Engagement Days (Total)", value=f"{totals['Engagment Days']:,.0f}")
+    lap(timer, "kpis")
 else:
     st.warning("Data could not be loaded.")
\ No newline at end of file
@@ -4,12 +4,16 @@ import plotly.express as px
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from charts import density_chart, histogram_chart
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Client Demographics", page_icon="👥", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Client Demographics")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 # 4. SAFETY CHECK
 if not df.empty:
@@ -23,13 +27,15 @@ if not df.empty:
         # 6. Chart 1: Age Distribution (Histogram)
         st.subheader("Age Distribution of Clients")
         # A histogram is perfect for showing the distribution of a single number.
-        fig_age = px.histogram(
+        # The bins are counted on the server, so only the counts reach the browser.
+        fig_age = histogram_chart(
             df, 
-            x='Age', 
+            'Age', 
             nbins=20, # We group ages into 20 bins
             title='Client Age Distribution'
         )
         st.plotly_chart(fig_age, use_container_width=True)
+        lap(timer, "plot: age")
 
         # 7. Chart 2: Top Occupations (Bar)
         st.subheader("Top Client Occupations")
@@ -38,6 +44,7 @@ if not df.empty:
         top_occupations = df['Occupation'].value_counts().nlargest(15).reset_index()
         top_occupations.columns = ['Occupation', 'Count']
         
+        lap(timer, "compute: occ")
         fig_occ = px.bar(
             top_occupations, 
             y='Occupation', # y is categorical
@@ -46,6 +53,7 @@ if not df.empty:
             title='Top 15 Client Occupations'
         )
         st.plotly_chart(fig_occ, use_container_width=True)
+        lap(timer, "plot: occ")
 
     with col2:
         # 8. Chart 3: Nationality (Pie)
@@ -53,6 +61,7 @@ if not df.empty:
         top_nationalities = df['Nationality'].value_counts().nlargest(15).reset_index()
         top_nationalities.columns = ['Nationality', 'Count']
 
+        lap(timer, "compute: nat")
         fig_nat = px.pie(
             top_nationalities,
             names='Nationality',
@@ -60,20 +69,22 @@ if not df.empty:
             title='Top 15 Client Nationalities'
         )
         st.plotly_chart(fig_nat, use_container_width=True)
+        lap(timer, "plot: nat")
         
         # 9. Chart 4: Income vs. Age (Scatter)
         st.subheader("Income vs. Age")
-        # Plotting 40,000+ dots is slow. We take a random sample
-        # of 1000 dots to make the chart fast and responsive.
-        df_sample = df.sample(min(1000, len(df)))
-        fig_scatter = px.scatter(
-            df_sample,
+        # Plotting 40,000+ dots is slow. Instead of a random sample, every
+        # client is counted into a density grid on the server; clients in
+        # nearly empty cells are still drawn as dots, colored by Gender.
+        fig_scatter = density_chart(
+            df,
             x='Age',
             y='Estimated Income',
             color='Gender', # We can use color to add a 3rd dimension
-            title='Estimated Income vs. Age (Sampled)'
+            title='Estimated Income vs. Age'
         )
         st.plotly_chart(fig_scatter, use_container_width=True)
+        lap(timer, "plot: scatter")
 
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
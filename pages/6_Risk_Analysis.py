@@ -4,12 +4,16 @@ import plotly.express as px
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from charts import box_chart
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Risk & Loyalty", page_icon="🛡️", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Risk & Loyalty")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 # 4. SAFETY CHECK
 if not df.empty:
@@ -26,6 +30,7 @@ if not df.empty:
         risk_counts = df['Risk Weighting'].value_counts().reset_index()
         risk_counts.columns = ['Risk Weighting', 'Count']
         
+        lap(timer, "compute: risk")
         fig_risk = px.pie(
             risk_counts,
             names='Risk Weighting',
@@ -33,19 +38,22 @@ if not df.empty:
             title='Distribution of Client Risk Weighting'
         )
         st.plotly_chart(fig_risk, use_container_width=True)
+        lap(timer, "plot: risk")
 
         # 7. Chart 2: Engagement by Loyalty (Box Plot)
         st.subheader("Engagement by Loyalty")
         # A box plot is perfect for comparing the distribution
         # (min, max, median, quartiles) of a number across categories.
-        fig_box = px.box(
+        # The quartiles are worked out on the server (once per data version),
+        # so only the box outlines reach the browser, not every client.
+        fig_box = box_chart(
             df,
             x='Loyalty Classification',
             y='Engagment Days',
-            color='Loyalty Classification',
             title='Engagement Days by Loyalty Classification'
         )
         st.plotly_chart(fig_box, use_container_width=True)
+        lap(timer, "plot: box")
 
 
     with col2:
@@ -54,6 +62,7 @@ if not df.empty:
         loyalty_counts = df['Loyalty Classification'].value_counts().reset_index()
         loyalty_counts.columns = ['Loyalty Classification', 'Count']
         
+        lap(timer, "compute: loyalty")
         fig_loyalty = px.pie(
             loyalty_counts,
             names='Loyalty Classification',
@@ -61,12 +70,14 @@ if not df.empty:
             title='Distribution of Client Loyalty'
         )
         st.plotly_chart(fig_loyalty, use_container_width=True)
+        lap(timer, "plot: loyalty")
         
         # 9. Chart 4: Loan by Risk (Bar)
         st.subheader("Total Loan by Risk Weighting")
         # We group by risk and SUM the total loan for each category.
         risk_loans = df.groupby('Risk Weighting')['Total Loan'].sum().reset_index()
         
+        lap(timer, "compute: risk_loan")
         fig_risk_loan = px.bar(
             risk_loans,
             x='Risk Weighting',
@@ -75,6 +86,7 @@ if not df.empty:
             title='Total Loan Amount by Risk Weighting'
         )
         st.plotly_chart(fig_risk_loan, use_container_width=True)
+        lap(timer, "plot: risk_loan")
 
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
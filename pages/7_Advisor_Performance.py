@@ -4,11 +4,14 @@ import plotly.express as px
 
 # Import the main data processing function
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
 
 st.set_page_config(page_title="Advisor Performance", page_icon="💼", layout="wide")
 
 # Load the clean data
+timer = start_page("Advisor Performance")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 if not df.empty:
     st.title("Investment Advisor Performance")
@@ -16,10 +19,11 @@ if not df.empty:
     # --- 1. Advisor Leaderboard (Table) ---
     st.subheader("Advisor Leaderboard")
 
-    df_clients = df.groupby('Investment Advisor')['Client ID'].nunique().reset_index(name='Total Clients')
-    df_financials = df.groupby('Investment Advisor')[['Total Deposit', 'Total Loan']].sum().reset_index()
+    df_clients = df.groupby('Investment Advisor', observed=True)['Client ID'].nunique().reset_index(name='Total Clients')
+    df_financials = df.groupby('Investment Advisor', observed=True)[['Total Deposit', 'Total Loan']].sum().reset_index()
     df_leaderboard = df_clients.merge(df_financials, on='Investment Advisor')
     df_leaderboard = df_leaderboard.sort_values(by='Total Clients', ascending=False)
+    lap(timer, "compute: leaderboard", rows=len(df))
     
     st.dataframe(
         df_leaderboard.set_index('Investment Advisor').style
@@ -30,6 +34,7 @@ if not df.empty:
         }),
         use_container_width=True
     )
+    lap(timer, "table: leaderboard")
 
     st.markdown("---")
 
@@ -40,6 +45,7 @@ if not df.empty:
         # --- 2a. Deposits by Advisor (Bar) ---
         st.subheader("Total Deposits by Advisor")
         df_deposits = df_leaderboard.sort_values(by='Total Deposit', ascending=False)
+        lap(timer, "compute: dep_bar")
         fig_dep_bar = px.bar(
             df_deposits,
             x='Investment Advisor',
@@ -47,18 +53,20 @@ if not df.empty:
             title='Total Deposits Managed by Advisor'
         )
         st.plotly_chart(fig_dep_bar, use_container_width=True)
+        lap(timer, "plot: dep_bar")
 
         # --- 2b. Client Loyalty by Advisor (Stacked Bar) ---
         # --- CODE MODIFIED TO AVOID 'barnorm' ---
         st.subheader("Client Loyalty Mix by Advisor")
-        df_loyalty_raw = df.groupby(['Investment Advisor', 'Loyalty Classification'])['Client ID'].count().reset_index(name='Client Count')
+        df_loyalty_raw = df.groupby(['Investment Advisor', 'Loyalty Classification'], observed=True)['Client ID'].count().reset_index(name='Client Count')
         # Calculate totals for each advisor
-        df_totals = df_loyalty_raw.groupby('Investment Advisor')['Client Count'].sum().reset_index(name='Total Clients')
+        df_totals = df_loyalty_raw.groupby('Investment Advisor', observed=True)['Client Count'].sum().reset_index(name='Total Clients')
         # Merge totals back
         df_loyalty = df_loyalty_raw.merge(df_totals, on='Investment Advisor')
         # Calculate percentage
         df_loyalty['Percentage'] = df_loyalty['Client Count'] / df_loyalty['Total Clients']
         
+        lap(timer, "compute: loyalty_stack")
         fig_loyalty_stack = px.bar(
             df_loyalty,
             x='Investment Advisor',
@@ -70,11 +78,13 @@ if not df.empty:
         # Format y-axis as percentage
         fig_loyalty_stack.update_layout(yaxis_tickformat=".0%") 
         st.plotly_chart(fig_loyalty_stack, use_container_width=True)
+        lap(timer, "plot: loyalty_stack")
 
     with col2:
         # --- 2c. Loans by Advisor (Bar) ---
         st.subheader("Total Loans by Advisor")
         df_loans = df_leaderboard.sort_values(by='Total Loan', ascending=False)
+        lap(timer, "compute: loan_bar")
         fig_loan_bar = px.bar(
             df_loans,
             x='Investment Advisor',
@@ -83,18 +93,20 @@ if not df.empty:
             color_discrete_sequence=['#ef553b'] # Use a different color
         )
         st.plotly_chart(fig_loan_bar, use_container_width=True)
+        lap(timer, "plot: loan_bar")
 
         # --- 2d. Client Risk by Advisor (Stacked Bar) ---
         # --- CODE MODIFIED TO AVOID 'barnorm' ---
         st.subheader("Client Risk Mix by Advisor")
-        df_risk_raw = df.groupby(['Investment Advisor', 'Risk Weighting'])['Client ID'].count().reset_index(name='Client Count')
+        df_risk_raw = df.groupby(['Investment Advisor', 'Risk Weighting'], observed=True)['Client ID'].count().reset_index(name='Client Count')
         # Calculate totals for each advisor
-        df_risk_totals = df_risk_raw.groupby('Investment Advisor')['Client Count'].sum().reset_index(name='Total Clients')
+        df_risk_totals = df_risk_raw.groupby('Investment Advisor', observed=True)['Client Count'].sum().reset_index(name='Total Clients')
         # Merge totals back
         df_risk = df_risk_raw.merge(df_risk_totals, on='Investment Advisor')
         # Calculate percentage
         df_risk['Percentage'] = df_risk['Client Count'] / df_risk['Total Clients']
 
+        lap(timer, "compute: risk_stack")
         fig_risk_stack = px.bar(
             df_risk,
             x='Investment Advisor',
@@ -106,6 +118,7 @@ if not df.empty:
         # Format y-axis as percentage
         fig_risk_stack.update_layout(yaxis_tickformat=".0%")
         st.plotly_chart(fig_risk_stack, use_container_width=True)
+        lap(timer, "plot: risk_stack")
 
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
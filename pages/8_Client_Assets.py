@@ -4,12 +4,16 @@ import plotly.express as px
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from charts import box_chart, density_chart, histogram_chart
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Client Asset Analysis", page_icon="🏠", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Client Asset Analysis")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 # 4. SAFETY CHECK
 if not df.empty:
@@ -26,6 +30,7 @@ if not df.empty:
         prop_counts = df['Properties Owned'].value_counts().reset_index()
         prop_counts.columns = ['Properties Owned', 'Client Count']
         
+        lap(timer, "compute: prop")
         fig_prop = px.bar(
             prop_counts,
             x='Properties Owned',
@@ -33,45 +38,48 @@ if not df.empty:
             title='Number of Properties Owned by Clients'
         )
         st.plotly_chart(fig_prop, use_container_width=True)
+        lap(timer, "plot: prop")
 
         # 7. Chart 2: Income vs. Savings (Scatter)
         st.subheader("Income vs. Superannuation Savings")
-        # We sample 1000 clients for performance
-        df_sample = df.sample(min(1000, len(df)))
-        
-        fig_scatter = px.scatter(
-            df_sample,
+        # All clients, counted into a density grid (see charts.density_chart)
+        fig_scatter = density_chart(
+            df,
             x='Estimated Income',
             y='Superannuation Savings',
             color='Loyalty Classification', # Add a color dimension
-            title='Estimated Income vs. Superannuation Savings (Sampled)'
+            title='Estimated Income vs. Superannuation Savings'
         )
         st.plotly_chart(fig_scatter, use_container_width=True)
+        lap(timer, "plot: scatter")
 
 
     with col2:
         # 8. Chart 3: Superannuation Savings (Histogram)
         st.subheader("Superannuation Savings Distribution")
         # A histogram shows the distribution of a continuous number.
-        fig_super = px.histogram(
+        # (binned on the server, see charts.histogram_chart)
+        fig_super = histogram_chart(
             df,
-            x='Superannuation Savings',
+            'Superannuation Savings',
             nbins=50, # Use 50 bins
             title='Distribution of Superannuation Savings'
         )
         st.plotly_chart(fig_super, use_container_width=True)
+        lap(timer, "plot: super")
 
         # 9. Chart 4: Assets by Loyalty (Box Plot)
         st.subheader("Savings by Loyalty")
         # A box plot compares the distributions
-        fig_box = px.box(
+        # (computed on the server, see charts.box_chart)
+        fig_box = box_chart(
             df,
             x='Loyalty Classification',
             y='Superannuation Savings',
-            color='Loyalty Classification',
             title='Superannuation Savings by Loyalty'
         )
         st.plotly_chart(fig_box, use_container_width=True)
+        lap(timer, "plot: box")
 
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
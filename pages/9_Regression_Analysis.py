@@ -1,20 +1,24 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from scipy import stats # Import for statistical calculations
 
 # 1. IMPORT OUR CLEANING FUNCTION
 from data_processing import load_and_clean_data
+from profiling import start_page, lap
+from charts import density_chart
+from data_stats import REGRESSION_CATEGORICALS, load_multiple_regression, load_regression
 
 # 2. SET PAGE CONFIGURATION
 st.set_page_config(page_title="Regression Analysis", page_icon="📈", layout="wide")
 
 # 3. LOAD THE DATA
+timer = start_page("Regression Analysis")
 df = load_and_clean_data()
+lap(timer, "load", rows=len(df))
 
 if not df.empty:
     st.title("Regression Analysis")
-    st.markdown("Analyze the statistical relationship between two numerical variables.")
+    st.markdown("Analyze the statistical relationship between two numerical variables, or explain one variable with several others.")
 
     # 4. DEFINE NUMERICAL COLUMNS
     # These are the columns a user can select for the analysis
@@ -53,34 +57,34 @@ if not df.empty:
     else:
         # 6. PERFORM STATISTICAL MODELING
         
-        # We sample 1000 clients for performance, as plotting all 40k+ is slow
-        df_sample = df.sample(min(1000, len(df)))
-        
-        # Use scipy.stats.linregress to get all regression results
-        # We must drop any NaN values for the model to work
-        df_clean = df_sample.dropna(subset=[x_var, y_var])
-        
-        # Calculate the linear regression
-        slope, intercept, r_value, p_value, std_err = stats.linregress(
-            df_clean[x_var], 
-            df_clean[y_var]
-        )
+        # Run the regression on ALL clients (rows with a missing value are
+        # skipped). It is worked out from 6 cached sums per pair of columns,
+        # so it gives the same results as scipy.stats.linregress on every
+        # row, without going over the rows again on each rerun.
+        regression = load_regression(df, x_var, y_var)
+        slope = regression['slope']
+        intercept = regression['intercept']
+        p_value = regression['p_value']
         
         # Calculate R-squared
-        r_squared = r_value**2
+        r_squared = regression['r_value']**2
+        lap(timer, "compute: regression", rows=regression['n'])
         
         # 7. DISPLAY PLOT
         st.subheader(f"Scatter Plot: {x_var} vs. {y_var}")
         
-        # Create a scatter plot with a built-in regression line
-        fig_scatter = px.scatter(
-            df_clean,
+        # Every client is counted into a density grid on the server, and the
+        # regression line from above is drawn on top (no need for Plotly
+        # to fit it again).
+        fig_scatter = density_chart(
+            df,
             x=x_var,
             y=y_var,
             title=f"Relationship between {x_var} and {y_var}",
-            trendline="ols" # "ols" stands for Ordinary Least Squares (our regression)
+            line=(slope, intercept)
         )
         st.plotly_chart(fig_scatter, use_container_width=True)
+        lap(timer, "plot: scatter")
 
         # 8. DISPLAY STATISTICAL RESULTS
         st.subheader("Statistical Model Results")
@@ -106,5 +110,66 @@ if not df.empty:
         else:
             st.write(f"- **P-value:** The p-value is {p_value:,.4f} (which is greater than 0.05), indicating that the relationship is **not statistically significant**.")
 
+    # 9. MULTIPLE REGRESSION
+    # Explain Y with several variables at once. Categorical variables get
+    # one 0/1 column per value, compared against their first value.
+    # The fit only reads a small cached matrix of sums (see data_stats.py),
+    # so changing the selection does not go over the rows again.
+    st.markdown("---")
+    st.subheader(f"Multiple Regression: What Drives {y_var}?")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        predictors = st.multiselect(
+            "Numerical variables:",
+            options=[col for col in numerical_cols if col != y_var],
+            default=[x_var] if x_var != y_var else []
+        )
+    with col2:
+        categoricals = st.multiselect(
+            "Categorical variables:",
+            options=REGRESSION_CATEGORICALS
+        )
+
+    if not predictors and not categoricals:
+        st.info("Select at least one variable to fit the model.")
+    else:
+        coefficients, summary = load_multiple_regression(df, y_var, predictors, categoricals)
+        lap(timer, "compute: multiple regression", rows=summary['n'])
+
+        mr_col1, mr_col2, mr_col3 = st.columns(3)
+        with mr_col1:
+            st.metric(label="R-squared (R²)", value=f"{summary['r_squared']:,.4f}")
+        with mr_col2:
+            st.metric(label="Adjusted R²", value=f"{summary['adj_r_squared']:,.4f}")
+        with mr_col3:
+            st.metric(label="Clients", value=f"{summary['n']:,}")
+
+        if summary['rank'] < len(coefficients):
+            st.warning("Some selected variables are exact combinations of others, so their coefficients are not unique.")
+
+        # The standardized coefficients show which variables matter most:
+        # the change in Y (in standard deviations) for a 1 standard
+        # deviation change in the variable.
+        df_importance = coefficients.drop(index='Intercept').reset_index()
+        df_importance = df_importance.reindex(df_importance['Standardized'].abs().sort_values().index)
+        fig_importance = px.bar(
+            df_importance,
+            x='Standardized',
+            y='Term',
+            orientation='h',
+            title=f"Standardized Coefficients for {y_var}"
+        )
+        st.plotly_chart(fig_importance, use_container_width=True)
+
+        st.dataframe(
+            coefficients.style.format({
+                'Coefficient': '{:,.4f}', 'Std. Error': '{:,.4f}', 't': '{:,.2f}',
+                'P-value': '{:.4f}', 'Standardized': '{:.4f}'
+            }, na_rep=''),
+            use_container_width=True
+        )
+        lap(timer, "table: multiple regression")
+
 else:
     st.warning("Data could not be loaded. Please check your data files.")
\ No newline at end of file
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# 1. DEFINE THE SETTINGS
+# Timings are always recorded: a clock read per step costs next to nothing.
+# Counting allocated bytes uses Python's tracemalloc, which slows every
+# allocation down, so it is off unless BANKING_PROFILE_MEMORY=1 is set or
+# it is switched on from the Diagnostics page.
+PROFILE_MEMORY = os.environ.get("BANKING_PROFILE_MEMORY") == "1"
+# Only the most recent steps are kept, so memory use stays flat.
+MAX_RECORDS = 20000
+PROFILE_DIR = "profiles"
+
+# The records are shared by all sessions of this server process.
+# Streamlit runs sessions in threads, hence the lock.
+_records = deque(maxlen=MAX_RECORDS)
+_lock = threading.Lock()
+
+if PROFILE_MEMORY:
+    tracemalloc.start()
+
+
+# 2. SWITCH MEMORY TRACKING ON AND OFF
+def memory_tracking():
+    """
+    True if allocated bytes are being counted.
+    """
+    return tracemalloc.is_tracing()
+
+
+def set_memory_tracking(enabled):
+    """
+    Starts or stops counting allocated bytes.
+    """
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _allocated():
+    """
+    The bytes currently allocated by Python, or None when not tracking.
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.get_traced_memory()[0]
+
+
+# 3. RECORD STEPS
+def _add_record(page, step, seconds, rows, allocated):
+    """
+    Stores one step in the shared records.
+    """
+    with _lock:
+        _records.append({
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'page': page,
+            'step': step,
+            'seconds': seconds,
+            'rows': rows,
+            'bytes allocated': allocated,
+        })
+
+
+@contextmanager
+def profile_step(page, step, rows=None):
+    """
+    Times the code inside a `with profile_step(...) as info:` block.
+    The number of rows processed can be given up front or set inside the
+    block with info['rows'] = ..., once it is known.
+    'bytes allocated' is the net growth of Python's memory over the step
+    (other sessions running at the same time are counted too).
+    """
+    info = {'rows': rows}
+    before = _allocated()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - start
+        after = _allocated()
+        allocated = after - before if before is not None and after is not None else None
+        _add_record(page, step, seconds, info['rows'], allocated)
+
+
+def start_page(page):
+    """
+    Starts timing one run of a page. Returns the timer to pass to lap.
+    """
+    return {'page': page, 'start': time.perf_counter(), 'allocated': _allocated()}
+
+
+def lap(timer, step, rows=None):
+    """
+    Records `step` as everything the page did since start_page or the
+    previous lap, so phases can be marked without re-indenting the page:
+        timer = start_page("Loan Analysis")
+        df = load_and_clean_data()
+        lap(timer, "load", rows=len(df))
+    """
+    now = time.perf_counter()
+    allocated_now = _allocated()
+    allocated = None
+    if allocated_now is not None and timer['allocated'] is not None:
+        allocated = allocated_now - timer['allocated']
+    _add_record(timer['page'], step, now - timer['start'], rows, allocated)
+    timer['start'] = now
+    timer['allocated'] = allocated_now
+
+
+# 4. READ AND EXPORT THE RECORDS
+def records_frame():
+    """
+    All kept records as a DataFrame, oldest first.
+    """
+    with _lock:
+        records = list(_records)
+    df_records = pd.DataFrame(records, columns=['time', 'page', 'step', 'seconds', 'rows', 'bytes allocated'])
+    # Steps without a row count or byte count hold None; make them NaN.
+    return df_records.astype({'rows': float, 'bytes allocated': float})
+
+
+def summary_frame(df_records=None):
+    """
+    One row per page and step: how often it ran and its typical, 95th
+    percentile and worst time, sorted with the slowest steps first.
+    """
+    if df_records is None:
+        df_records = records_frame()
+    df_summary = df_records.groupby(['page', 'step'], sort=False).agg(
+        runs=('seconds', 'size'),
+        mean_s=('seconds', 'mean'),
+        p95_s=('seconds', lambda s: s.quantile(0.95)),
+        max_s=('seconds', 'max'),
+        total_s=('seconds', 'sum'),
+        rows=('rows', 'max'),
+        mean_bytes=('bytes allocated', 'mean'),
+    ).reset_index()
+    return df_summary.sort_values('total_s', ascending=False, ignore_index=True)
+
+
+def clear_records():
+    """
+    Forgets every record.
+    """
+    with _lock:
+        _records.clear()
+
+
+def dump_records(path=None):
+    """
+    Writes all kept records to a CSV file for offline analysis and
+    returns its path (by default a new file in PROFILE_DIR).
+    """
+    if path is None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"profile-{datetime.now():%Y%m%d-%H%M%S}.csv")
+    records_frame().to_csv(path, index=False)
+    return path
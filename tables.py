@@ -0,0 +1,121 @@
+import numpy as np
+import streamlit as st
+
+from data_index import prefix_positions
+from data_processing import cached_per_dataset, filtered_view
+
+# 1. DEFINE THE TABLE SETTINGS
+# Long client lists are shown one page at a time: only the visible rows are
+# gathered and sent to the browser, however many clients match. Sorting
+# and searching use indexes built once per version of the data, so they
+# never sort or scan the client rows again on a rerun.
+PAGE_SIZE = 50
+# The columns the search box looks in (by prefix, ignoring case).
+SEARCH_COLS = ['Name', 'Client ID']
+
+
+# 2. SORTED INDEXES
+# Like the bitmap index (see data_index.py), these are cached with
+# st.cache_resource: one shared copy for all users instead of a copy per
+# rerun. They are never changed after they are built. Searching uses the
+# prefix index in data_index.py.
+def sort_order(df, column):
+    """
+    The row positions of df in order of column (ties keep their row
+    order). Returns (order, n_valid): missing values come last, after the
+    first n_valid positions.
+    """
+    values = df[column].reset_index(drop=True)
+    order = values.sort_values(kind='stable', na_position='last').index.to_numpy()
+    return order, int(values.notna().sum())
+
+
+load_sort_order = cached_per_dataset(sort_order, resource=True, max_entries=32)
+
+
+def search_positions(df, text, columns=SEARCH_COLS):
+    """
+    The row positions of df where any of columns starts with text, in row
+    order.
+    """
+    matches = [prefix_positions(df, column, text.strip()) for column in columns]
+    return np.unique(np.concatenate(matches))
+
+
+# 3. SELECT ONE PAGE
+def _keep(n_rows, positions):
+    """
+    A True/False array over all rows, True at positions.
+    """
+    keep = np.zeros(n_rows, dtype=bool)
+    keep[positions] = True
+    return keep
+
+
+def table_positions(df, positions=None, search=None, sort_by=None, ascending=True):
+    """
+    The row positions to show, in display order:
+    - positions: the rows to start from (e.g. a filter's result); None is
+      every row.
+    - search: keep the rows where a SEARCH_COLS column starts with it.
+    - sort_by: put them in order of this column, from its cached sort
+      order (missing values last either way).
+    Selecting rows out of a sorted order is one vectorized pass, not a sort.
+    """
+    n_rows = len(df)
+    if search and search.strip():
+        found = search_positions(df, search)
+        positions = found if positions is None else found[_keep(n_rows, positions)[found]]
+    if sort_by is None:
+        return np.arange(n_rows) if positions is None else positions
+
+    order, n_valid = load_sort_order(df, sort_by)
+    if not ascending:
+        order = np.concatenate([order[:n_valid][::-1], order[n_valid:]])
+    if positions is None:
+        return order
+    return order[_keep(n_rows, positions)[order]]
+
+
+def page_positions(positions, page, page_size=PAGE_SIZE):
+    """
+    The positions on page number `page` (starting at 1).
+    """
+    start = (page - 1) * page_size
+    return positions[start:start + page_size]
+
+
+# 4. THE TABLE COMPONENT
+def paginated_table(df, columns, positions=None, key='table', page_size=PAGE_SIZE):
+    """
+    Draws a table of df's rows at positions (None for every row) with a
+    search box, a sort control and page numbers. Only the visible page is
+    gathered and sent to the browser. key keeps the controls of several
+    tables on one page apart.
+    Returns the number of rows matching the search.
+    """
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        search = st.text_input("Search Name or Client ID (starts with):", key=f"{key}_search")
+    with col2:
+        sort_by = st.selectbox("Sort by:", options=['(none)'] + list(columns), key=f"{key}_sort")
+    with col3:
+        ascending = st.radio("Order:", options=['Ascending', 'Descending'], key=f"{key}_order") == 'Ascending'
+
+    shown = table_positions(
+        df, positions, search=search,
+        sort_by=None if sort_by == '(none)' else sort_by, ascending=ascending
+    )
+    n_pages = max(1, -(-len(shown) // page_size))
+    # A new search or filter can leave fewer pages than the one we were on.
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > n_pages:
+        st.session_state[page_key] = 1
+    page = st.number_input(f"Page (of {n_pages:,}):", min_value=1, max_value=n_pages, step=1, key=page_key)
+
+    visible = page_positions(shown, page, page_size)
+    st.dataframe(filtered_view(df, visible, columns), use_container_width=True)
+    if len(shown):
+        first = (page - 1) * page_size + 1
+        st.caption(f"Rows {first:,}-{first + len(visible) - 1:,} of {len(shown):,}")
+    return len(shown)
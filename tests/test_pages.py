@@ -0,0 +1,76 @@
+import glob
+import os
+import sys
+
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+# 1. FIND THE APP
+# The pages open the data files relative to the folder the app is started
+# from, so the tests run from the repository root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from data_processing import load_and_clean_data  # noqa: E402
+
+PAGES = [os.path.join(ROOT, '1_Home.py')] + sorted(glob.glob(os.path.join(ROOT, 'pages', '*.py')))
+
+
+# 2. THE SHARED FRAME
+# load_and_clean_data hands every session the same cached DataFrame. The
+# pages must select from it with filtered_view and never copy or modify it
+# (see data_processing.py, section 6).
+@pytest.fixture(scope='module')
+def shared_frame():
+    df = load_and_clean_data()
+    assert len(df) > 0, "the data files are needed to run the pages"
+    return df
+
+
+def frame_fingerprint(df):
+    """
+    The columns, dtypes and a hash of every value of df, to tell whether
+    a page changed it.
+    """
+    return list(df.columns), list(df.dtypes.astype(str)), pd.util.hash_pandas_object(df, index=True).sum()
+
+
+# 3. RUN EVERY PAGE
+@pytest.mark.parametrize('page', PAGES, ids=os.path.basename)
+def test_page_does_not_copy_or_modify_shared_frame(page, shared_frame, monkeypatch):
+    before = frame_fingerprint(shared_frame)
+    name = os.path.basename(page)
+    copy = pd.DataFrame.copy
+    finalize = pd.DataFrame.__finalize__
+
+    def copy_unless_full_frame(self, deep=True):
+        # Any deep copy as long as the whole book is a per-session copy of
+        # it. Shallow copies (pandas makes them inside e.g. dropna) share
+        # the data instead of allocating it again.
+        if deep and len(self) == len(shared_frame):
+            raise AssertionError(f"{name} copied the full client frame")
+        return copy(self, deep=deep)
+
+    def finalize_unless_full_frame(self, other, *args, **kwargs):
+        # Every frame pandas derives from another (a boolean mask, take,
+        # filter_rows, ...) passes through here. One holding every row and
+        # every column of the shared frame is a copy of it, however it
+        # was made: pages should use the shared frame itself instead.
+        result = finalize(self, other, *args, **kwargs)
+        if (
+            isinstance(self, pd.DataFrame) and self is not shared_frame
+            and len(self) == len(shared_frame) and list(self.columns) == list(shared_frame.columns)
+        ):
+            raise AssertionError(f"{name} made a full-size copy of the client frame")
+        return result
+
+    monkeypatch.setattr(pd.DataFrame, 'copy', copy_unless_full_frame)
+    monkeypatch.setattr(pd.DataFrame, '__finalize__', finalize_unless_full_frame)
+    at = AppTest.from_file(page, default_timeout=60).run()
+    monkeypatch.undo()
+
+    assert not at.exception, [e.message for e in at.exception]
+    assert load_and_clean_data() is shared_frame
+    assert frame_fingerprint(shared_frame) == before